@@ -0,0 +1,8 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def thumbnails_inline(settings):
+    # SQLite в памяти: запись из потока пула превью блокирует таблицы
+    # соединению теста
+    settings.THUMBNAIL_INLINE = True
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from core import page_cache
+
+USER_KEY = 'api-user:{}'
+
+
+def user_scope(user_id):
+    """Область версий пользователя: меняется при каждом его сохранении."""
+    return f'user:{user_id}'
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication, которая берёт пользователя из кэша.
+
+    Пользователь хранится в кэше вместе с версией его области, и запись
+    годится, только пока версия не изменилась. Версия увеличивается при
+    сохранении и удалении пользователя (смена пароля, блокировка),
+    поэтому изменения видны сразу, а на остальные запросы запись и
+    версия читаются одним обращением к кэшу, без запроса к базе.
+
+    Сразу — только если кэш общий для всех процессов: версию увеличивает
+    процесс, сохранивший пользователя. Поэтому без общего кэша
+    API_USER_CACHE_TIMEOUT равен 0, и пользователь читается из базы.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None or not settings.API_USER_CACHE_TIMEOUT:
+            return super().get_user(validated_token)
+        version_key = page_cache.VERSION_KEY.format(user_scope(user_id))
+        user_key = USER_KEY.format(user_id)
+        cached = cache.get_many([version_key, user_key])
+        version = cached.get(version_key)
+        entry = cached.get(user_key)
+        if version is not None and entry is not None and entry[0] == version:
+            user = entry[1]
+        else:
+            # Версия читается до пользователя: если он изменится между
+            # чтениями, запись сохранится со старой версией и не найдётся
+            if version is None:
+                version = page_cache.get_versions([user_scope(user_id)])[0]
+            user = super().get_user(validated_token)
+            cache.set(
+                user_key, (version, user), settings.API_USER_CACHE_TIMEOUT)
+        if not user.is_active:
+            raise AuthenticationFailed(
+                _('User is inactive'), code='user_inactive')
+        return user
@@ -0,0 +1,193 @@
+import base64
+import binascii
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class CursorPagination(BasePagination):
+    """Постраничный вывод по ключу без COUNT(*) и OFFSET.
+
+    Ключ — поля ordering вьюсета (по умолчанию pub_date и id), курсор —
+    непрозрачная строка с ключом крайней записи страницы и направлением.
+    Следующая страница выбирается условием «после этого ключа», поэтому
+    глубокие страницы читаются так же быстро, как первая.
+
+    Общее число записей по умолчанию не считается. С параметром count
+    в ответ добавляется его оценка: не больше count_limit и не старше
+    count_timeout секунд. Если queryset уже упорядочен по-своему
+    (например, по релевантности поиска), курсор хранит смещение.
+    """
+    ordering = ('-pub_date', '-id')
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    count_limit = 10000
+    count_timeout = 60
+    invalid_cursor_message = 'Неверный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_page_size(request)
+        self.count = None
+        if self.count_query_param in request.query_params:
+            self.count = self.get_count(queryset)
+        cursor = self.decode_cursor(request)
+        if queryset.query.order_by:
+            return self.paginate_by_offset(queryset, cursor)
+        ordering = getattr(view, 'ordering', None) or self.ordering
+        return self.paginate_by_key(queryset, ordering, cursor)
+
+    def paginate_by_key(self, queryset, ordering, cursor):
+        backwards = bool(cursor and cursor.get('r'))
+        if backwards:
+            ordering = [self.reverse(field) for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if cursor:
+            queryset = queryset.filter(
+                self.after(queryset.model, ordering, cursor.get('k')))
+        # На одну запись больше, чтобы узнать, есть ли продолжение
+        rows = list(queryset[:self.limit + 1])
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        if backwards:
+            rows.reverse()
+            ordering = [self.reverse(field) for field in ordering]
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, cursor is not None
+        self.next_cursor = self.previous_cursor = None
+        if rows and has_next:
+            self.next_cursor = {'k': self.key(rows[-1], ordering)}
+        if rows and has_previous:
+            self.previous_cursor = {
+                'k': self.key(rows[0], ordering), 'r': True}
+        return rows
+
+    def paginate_by_offset(self, queryset, cursor):
+        offset = cursor.get('o', 0) if cursor else 0
+        if not isinstance(offset, int) or offset < 0:
+            raise NotFound(self.invalid_cursor_message)
+        rows = list(queryset[offset:offset + self.limit + 1])
+        self.next_cursor = self.previous_cursor = None
+        if len(rows) > self.limit:
+            self.next_cursor = {'o': offset + self.limit}
+        if offset:
+            self.previous_cursor = {'o': max(offset - self.limit, 0)}
+        return rows[:self.limit]
+
+    def get_paginated_response(self, data):
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_link(self.next_cursor)
+        response['previous'] = self.get_link(self.previous_cursor)
+        response['results'] = data
+        return Response(response)
+
+    def get_page_size(self, request):
+        try:
+            limit = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if limit <= 0:
+            return self.page_size
+        return min(limit, self.max_page_size)
+
+    def get_count(self, queryset):
+        """Число записей, но не больше count_limit. Запоминается
+        на count_timeout секунд, чтобы не считать на каждый запрос."""
+        sql, params = queryset.query.sql_with_params()
+        key = 'api-count:{}'.format(
+            hashlib.md5(f'{sql}{params}'.encode()).hexdigest())
+        count = cache.get(key)
+        if count is None:
+            count = queryset.order_by()[:self.count_limit].count()
+            cache.set(key, count, self.count_timeout)
+        return count
+
+    @staticmethod
+    def reverse(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def key(obj, ordering):
+        values = []
+        for field in ordering:
+            value = getattr(obj, field.lstrip('-'))
+            values.append(
+                value.isoformat() if hasattr(value, 'isoformat') else value)
+        return values
+
+    def after(self, model, ordering, values):
+        """Условие «запись идёт после ключа values» для ordering."""
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            try:
+                value = model._meta.get_field(name).to_python(value)
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (binascii.Error, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(cursor, dict):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(cursor, separators=(',', ':')).encode()).decode()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Курсор страницы из ссылок next и previous',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Записей на странице, не больше '
+                               f'{self.max_page_size}',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.count_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Добавить в ответ примерное число записей',
+                'schema': {'type': 'boolean'},
+            },
+        ]
@@ -1,40 +1,169 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.urls import reverse
 from rest_framework import serializers
 from rest_framework.relations import SlugRelatedField
-from rest_framework.validators import UniqueTogetherValidator
 
-from posts.models import Post, Comment, User, Group, Follow
+from posts.counters import get_stats
+from posts.images import ingest
+from posts.models import (Post, Comment, User, Group, Follow,
+                          Recommendation)
+
+
+class EagerLoadingMixin:
+    """План загрузки: связи, которые сериализатор читает у каждого
+    объекта. Вьюсеты подгружают их заранее, поэтому число запросов
+    не зависит от размера страницы."""
+    select_related = ()
+    prefetch_related = ()
 
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related:
+            queryset = queryset.select_related(*cls.select_related)
+        if cls.prefetch_related:
+            queryset = queryset.prefetch_related(*cls.prefetch_related)
+        return queryset
 
-class PostSerializer(serializers.ModelSerializer):
+
+class PostSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     author = SlugRelatedField(read_only=True, slug_field='username')
+    select_related = ('author',)
 
     class Meta:
         fields = '__all__'
         model = Post
 
-
-class CommentSerializer(serializers.ModelSerializer):
+    def validate(self, attrs):
+        image = attrs.get('image')
+        if image:
+            try:
+                image, width, height = ingest(image)
+            except DjangoValidationError as error:
+                raise serializers.ValidationError({'image': error.messages})
+            attrs.update(
+                image=image, image_width=width, image_height=height)
+        elif 'image' in attrs:
+            attrs.update(image_width=None, image_height=None)
+        return attrs
+
+
+class CommentSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     author = serializers.SlugRelatedField(
         read_only=True, slug_field='username'
     )
     post = serializers.PrimaryKeyRelatedField(read_only=True)
+    select_related = ('author',)
 
     class Meta:
         fields = '__all__'
         model = Comment
 
 
-class UserSerializer(serializers.ModelSerializer):
-    posts = serializers.StringRelatedField(
-        many=True, read_only=True, required=False
-    )
-    comments = serializers.StringRelatedField(
-        many=True, read_only=True, required=False
-    )
+def latest_by_author(queryset, author_ids, count):
+    """Последние count записей queryset каждого автора одним запросом.
+
+    Для каждого автора строится подзапрос с LIMIT, подзапросы
+    объединяются UNION ALL, и каждый читает по индексу (author,
+    -pub_date, -id) только свои count строк. Возвращает словарь
+    id автора → записи от новых к старым.
+    """
+    parts = []
+    params = []
+    for number, author_id in enumerate(author_ids):
+        sql, part_params = queryset.filter(
+            author_id=author_id)[:count].query.sql_with_params()
+        parts.append(f'SELECT * FROM ({sql}) AS latest_{number}')
+        params.extend(part_params)
+    latest = defaultdict(list)
+    if not parts:
+        return latest
+    for item in queryset.model.objects.raw(' UNION ALL '.join(parts), params):
+        latest[item.author_id].append(item)
+    # UNION ALL не обязан сохранять порядок подзапросов
+    for items in latest.values():
+        items.sort(key=lambda item: (item.pub_date, item.id), reverse=True)
+    return latest
+
+
+class UserListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        users = list(data)
+        self.child.prefetch_latest(users)
+        return super().to_representation(users)
+
+
+class UserSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    """Пользователь со счётчиками, последними постами и комментариями
+    и ссылками на их полные списки. Размер записи и число запросов
+    не зависят от того, сколько пользователь написал, а у списка —
+    и от числа пользователей на странице."""
+    LATEST_ITEMS = 5
+
+    posts_count = serializers.SerializerMethodField()
+    comments_count = serializers.SerializerMethodField()
+    posts = serializers.SerializerMethodField()
+    comments = serializers.SerializerMethodField()
+    posts_url = serializers.SerializerMethodField()
+    comments_url = serializers.SerializerMethodField()
+    select_related = ('stats',)
 
     class Meta:
         model = User
-        fields = ('id', 'username', 'posts', 'comments')
+        fields = ('id', 'username', 'posts_count', 'comments_count',
+                  'posts', 'comments', 'posts_url', 'comments_url')
+        list_serializer_class = UserListSerializer
+
+    def get_posts_count(self, obj):
+        return get_stats(obj).posts_count
+
+    def get_comments_count(self, obj):
+        return get_stats(obj).comments_count
+
+    @staticmethod
+    def latest_queryset(queryset):
+        # author нужен связанному менеджеру, иначе он дочитает его
+        # отдельным запросом для каждой записи
+        return queryset.order_by('-pub_date', '-id').only(
+            'id', 'pub_date', 'text', 'author')
+
+    def prefetch_latest(self, users):
+        """Последние записи всех пользователей страницы: по запросу
+        на посты и на комментарии."""
+        ids = [user.id for user in users]
+        posts = latest_by_author(
+            self.latest_queryset(Post.objects.all()), ids, self.LATEST_ITEMS)
+        comments = latest_by_author(
+            self.latest_queryset(Comment.objects.all()), ids,
+            self.LATEST_ITEMS)
+        for user in users:
+            user.latest_posts = posts[user.id]
+            user.latest_comments = comments[user.id]
+
+    def latest(self, obj, attr, queryset):
+        items = getattr(obj, attr, None)
+        if items is None:
+            items = self.latest_queryset(queryset)[:self.LATEST_ITEMS]
+        return [str(item) for item in items]
+
+    def get_posts(self, obj):
+        return self.latest(obj, 'latest_posts', obj.posts.all())
+
+    def get_comments(self, obj):
+        return self.latest(obj, 'latest_comments', obj.comments.all())
+
+    def link(self, view_name, obj):
+        url = reverse(view_name, kwargs={'username': obj.username})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def get_posts_url(self, obj):
+        return self.link('user-posts-list', obj)
+
+    def get_comments_url(self, obj):
+        return self.link('user-comments-list', obj)
 
 
 class GroupSerializer(serializers.ModelSerializer):
@@ -44,29 +173,56 @@ class GroupSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class FollowSerializer(serializers.ModelSerializer):
+class FollowSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     user = serializers.SlugRelatedField(
         read_only=True, slug_field='username',
         default=serializers.CurrentUserDefault()
     )
+    # В модели поле называется author: без source сериализатор искал
+    # несуществующее Follow.following и не мог создать подписку
     following = serializers.SlugRelatedField(
         slug_field='username',
+        source='author',
         queryset=User.objects.all()
     )
+    select_related = ('user', 'author')
 
     class Meta:
         model = Follow
         fields = ('user', 'following')
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Follow.objects.all(),
-                fields=('user', 'following'),
-                message='Вы уже подписаны на данного автора!'
-            )
-        ]
+        # Повтор проверяет сама вставка (follows.follow), а не
+        # отдельный запрос exists() перед ней
+        validators = []
+
+    default_error_messages = {
+        'already_following': 'Вы уже подписаны на данного автора!',
+    }
 
     def validate_following(self, value):
         if value == self.context['request'].user:
             raise serializers.ValidationError(
                 'Нельзя подписаться на самого себя!')
         return value
+
+
+class RecommendationSerializer(serializers.ModelSerializer):
+    author = serializers.SlugRelatedField(
+        read_only=True, slug_field='username')
+
+    class Meta:
+        model = Recommendation
+        fields = ('author', 'score')
+
+
+class FollowBulkSerializer(serializers.Serializer):
+    follow = serializers.ListField(
+        child=serializers.CharField(max_length=150), required=False)
+    unfollow = serializers.ListField(
+        child=serializers.CharField(max_length=150), required=False)
+
+    def validate(self, attrs):
+        limit = settings.API_BULK_MAX_ITEMS
+        if sum(len(names) for names in attrs.values()) > limit:
+            raise serializers.ValidationError(
+                f'Не больше {limit} имён за запрос')
+        return attrs
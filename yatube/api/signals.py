@@ -0,0 +1,15 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core import page_cache
+from .authentication import user_scope
+
+User = get_user_model()
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, raw=False, **kwargs):
+    # Пользователь из кэша аутентификации больше не годится
+    if not raw:
+        page_cache.invalidate(user_scope(instance.id))
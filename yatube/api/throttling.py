@@ -0,0 +1,16 @@
+from rest_framework.throttling import BaseThrottle
+
+from core import ratelimit
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Ограничение частоты запросов к API корзиной токенов из
+    core.ratelimit; лимиты — settings.RATE_LIMITS[scope]."""
+    scope = 'api'
+
+    def allow_request(self, request, view):
+        self.wait_seconds = ratelimit.hit(request, self.scope)
+        return self.wait_seconds is None
+
+    def wait(self):
+        return self.wait_seconds
@@ -1,7 +1,9 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import PostViewSet, GroupViewSet, CommentViewSet, FollowViewSet
+from .views import (PostViewSet, GroupViewSet, CommentViewSet, FollowViewSet,
+                    UserPostViewSet, UserCommentViewSet,
+                    RecommendationViewSet, UserViewSet)
 
 router = DefaultRouter()
 router.register('posts', PostViewSet, basename='posts')
@@ -9,6 +11,13 @@ router.register('groups', GroupViewSet, basename='groups')
 router.register(r'^posts/(?P<post_id>\d+)/comments', CommentViewSet,
                 basename='comments')
 router.register('follow', FollowViewSet, basename='follow')
+router.register('authors', UserViewSet, basename='authors')
+router.register(r'users/(?P<username>[\w.@+-]+)/posts', UserPostViewSet,
+                basename='user-posts')
+router.register(r'users/(?P<username>[\w.@+-]+)/comments',
+                UserCommentViewSet, basename='user-comments')
+router.register('recommendations', RecommendationViewSet,
+                basename='recommendations')
 
 urlpatterns = [
     path('v1/', include(router.urls)),
@@ -1,39 +1,258 @@
-from rest_framework import viewsets, permissions, filters, mixins
-from rest_framework.pagination import LimitOffsetPagination
+from itertools import islice
 
-from posts.models import Post, Comment, User, Group
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+from rest_framework import viewsets, permissions, filters, mixins, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from core import page_cache
+from posts import bulk, follows, recommendations, search, thumbnails
+from posts.models import Post, Comment, User, Group, Follow
+from .pagination import CursorPagination
 from .serializers import (UserSerializer, GroupSerializer, PostSerializer,
-                          CommentSerializer, FollowSerializer)
+                          CommentSerializer, FollowSerializer,
+                          FollowBulkSerializer, RecommendationSerializer)
 from .permissions import IsAuthorOrReadOnly
 
 
-class PostViewSet(viewsets.ModelViewSet):
-    queryset = Post.objects.all()
+def accepts_gzip(accept_encoding):
+    """Принимает ли клиент gzip по заголовку Accept-Encoding.
+
+    Учитываем q-значения: «gzip;q=0» — явный отказ, а «*» без
+    упоминания gzip его разрешает.
+    """
+    weights = {}
+    for item in accept_encoding.lower().split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding] = weight
+    return weights.get('gzip', weights.get('*', 0.0)) > 0
+
+
+class EagerLoadingViewMixin:
+    """Применяет к queryset план загрузки сериализатора.
+
+    План применяется в filter_queryset: его вызывают и list, и
+    get_object, а get_queryset вьюсеты переопределяют по-своему.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return self.get_serializer_class().setup_eager_loading(queryset)
+
+
+class ConditionalListMixin:
+    """ETag и Last-Modified для списка.
+
+    Валидаторы — версии областей кэша страниц, к которым относятся
+    записи списка (validator_scopes, шаблоны заполняются аргументами
+    маршрута). Клиент с актуальной копией получает 304 до запросов
+    к базе и сериализации.
+    """
+    validator_scopes = ()
+
+    def get_validator_scopes(self):
+        return [scope.format(**self.kwargs) for scope in self.validator_scopes]
+
+    def list(self, request, *args, **kwargs):
+        versions, changed_at = page_cache.get_state(
+            [page_cache.ALL_PAGES] + self.get_validator_scopes())
+        etag, last_modified = page_cache.validators(
+            request, versions, changed_at, request.accepted_renderer.format)
+        response = page_cache.not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+        response = super().list(request, *args, **kwargs)
+        return page_cache.set_validators(response, etag, last_modified)
+
+
+class StreamingListMixin:
+    """Список целиком потоком, по параметру ?stream=1.
+
+    Записи читаются из базы курсором пачками по stream_chunk_size,
+    каждая пачка сериализуется и сразу отправляется, поэтому память
+    не зависит от длины списка. Клиентам, которые принимают gzip,
+    поток сжимается на лету.
+    """
+    stream_query_param = 'stream'
+    stream_chunk_size = 500
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get(self.stream_query_param) != '1':
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        if not queryset.query.order_by:
+            queryset = queryset.order_by(
+                *(getattr(self, 'ordering', None) or self.paginator.ordering))
+        response = StreamingHttpResponse(
+            self.stream_json(queryset), content_type='application/json')
+        if accepts_gzip(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            response.streaming_content = compress_sequence(
+                response.streaming_content)
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    def stream_json(self, queryset):
+        serializer_class = self.get_serializer_class()
+        context = self.get_serializer_context()
+        renderer = JSONRenderer()
+        rows = queryset.iterator(chunk_size=self.stream_chunk_size)
+        separator = b''
+        yield b'['
+        while True:
+            chunk = list(islice(rows, self.stream_chunk_size))
+            if not chunk:
+                break
+            data = serializer_class(chunk, many=True, context=context).data
+            # Пачка рендерится списком, от него остаются только элементы
+            yield separator + renderer.render(data)[1:-1]
+            separator = b','
+        yield b']'
+
+
+class BulkCreateMixin:
+    """POST на <список>/bulk/ с массивом записей.
+
+    Записи проверяются все сразу и сохраняются одной массовой вставкой
+    в одной транзакции: либо все, либо ни одной. При ошибках ответ 400
+    содержит список ошибок по порядку записей, при успехе ответ 201 —
+    созданные записи в том же порядке.
+
+    Вьюсет обязан определить perform_bulk_create(objs): он сохраняет
+    несохранённые объекты модели и возвращает их.
+    """
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request, *args, **kwargs):
+        if not hasattr(self, 'perform_bulk_create'):
+            raise ImproperlyConfigured(
+                f'{type(self).__name__} должен определить '
+                f'perform_bulk_create')
+        limit = settings.API_BULK_MAX_ITEMS
+        if isinstance(request.data, list) and len(request.data) > limit:
+            raise ValidationError(f'Не больше {limit} записей за запрос')
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        model = serializer.child.Meta.model
+        with transaction.atomic():
+            objs = self.perform_bulk_create(
+                [model(**attrs) for attrs in serializer.validated_data])
+        return Response(
+            self.get_serializer(objs, many=True).data,
+            status=status.HTTP_201_CREATED)
+
+
+class PostViewSet(
+        BulkCreateMixin, ConditionalListMixin, StreamingListMixin,
+        EagerLoadingViewMixin, viewsets.ModelViewSet):
+    queryset = Post.objects.feed()
     serializer_class = PostSerializer
     permission_classes = (IsAuthorOrReadOnly,)
-    pagination_class = LimitOffsetPagination
+    pagination_class = CursorPagination
+    validator_scopes = ('index', 'comments')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        query = self.request.query_params.get('search')
+        if query and self.action == 'list':
+            # Сначала самые релевантные посты
+            queryset = search.search(queryset, query)
+        return queryset
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        post = serializer.save(author=self.request.user)
+        thumbnails.schedule(post)
 
+    @transaction.atomic
+    def perform_update(self, serializer):
+        post = serializer.save()
+        if 'image' in serializer.validated_data:
+            thumbnails.schedule(post)
 
-class CommentViewSet(viewsets.ModelViewSet):
+    def perform_bulk_create(self, posts):
+        # Превью не нужны: в JSON-массиве картинки не передаются
+        return bulk.create_posts(self.request.user, posts)
+
+
+class CommentViewSet(
+        BulkCreateMixin, ConditionalListMixin, StreamingListMixin,
+        EagerLoadingViewMixin, viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = (IsAuthorOrReadOnly,)
+    pagination_class = CursorPagination
+    validator_scopes = ('post:{post_id}',)
 
     def get_queryset(self):
         post_id = self.kwargs.get('post_id')
         new_queryset = Comment.objects.filter(post=post_id)
         return new_queryset
 
+    @transaction.atomic
     def perform_create(self, serializer):
         post_id = self.kwargs.get('post_id')
         serializer.save(author=self.request.user, post_id=post_id)
 
+    def perform_bulk_create(self, comments):
+        post = get_object_or_404(Post, id=self.kwargs.get('post_id'))
+        return bulk.create_comments(self.request.user, post, comments)
+
 
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
+class UserViewSet(EagerLoadingViewMixin, viewsets.ReadOnlyModelViewSet):
+    """Авторы: users/ занят djoser (регистрация, users/me/)."""
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
+    pagination_class = CursorPagination
+    # Авторы по алфавиту: курсор идёт по уникальному индексу имени
+    ordering = ('username',)
+    lookup_field = 'username'
+    lookup_value_regex = r'[\w.@+-]+'
+
+
+class UserPostViewSet(
+        ConditionalListMixin, StreamingListMixin, EagerLoadingViewMixin,
+        mixins.ListModelMixin, viewsets.GenericViewSet):
+    """Все посты пользователя, по ссылке posts_url из UserSerializer."""
+    serializer_class = PostSerializer
+    permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
+    pagination_class = CursorPagination
+    validator_scopes = ('profile:{username}', 'comments')
+
+    def get_queryset(self):
+        author = get_object_or_404(User, username=self.kwargs['username'])
+        return Post.objects.feed().filter(author=author)
+
+
+class UserCommentViewSet(
+        ConditionalListMixin, StreamingListMixin, EagerLoadingViewMixin,
+        mixins.ListModelMixin, viewsets.GenericViewSet):
+    """Все комментарии пользователя, по ссылке comments_url."""
+    serializer_class = CommentSerializer
+    permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
+    pagination_class = CursorPagination
+    validator_scopes = ('comments',)
+
+    def get_queryset(self):
+        author = get_object_or_404(User, username=self.kwargs['username'])
+        return Comment.objects.filter(author=author)
 
 
 class GroupViewSet(viewsets.ReadOnlyModelViewSet):
@@ -49,16 +268,85 @@ class FollowBaseViewSet(
     pass
 
 
-class FollowViewSet(FollowBaseViewSet):
+class FollowViewSet(
+        ConditionalListMixin, StreamingListMixin, EagerLoadingViewMixin,
+        FollowBaseViewSet):
     serializer_class = FollowSerializer
     permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = CursorPagination
+    # У подписок нет даты, курсор строится по id
+    ordering = ('-id',)
     filter_backends = (filters.SearchFilter,)
     search_fields = ['following__username']
 
+    def get_validator_scopes(self):
+        # Подписки меняют версию профиля подписчика
+        return [f'profile:{self.request.user.username}']
+
     def get_queryset(self):
         user = self.request.user
         new_queryset = user.follower.all()
         return new_queryset
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        # Один INSERT: повторную подписку, в том числе одновременную,
+        # база пропускает, и это превращается в ответ 400
+        author = serializer.validated_data['author']
+        if not follows.follow(self.request.user, author):
+            raise ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    serializer.error_messages['already_following']],
+            })
+        serializer.instance = Follow(user=self.request.user, author=author)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Подписка и отписка по спискам имён в одной транзакции.
+
+        В ответе для каждого имени — что произошло: followed,
+        already_following, unfollowed, not_following, self или not_found.
+        """
+        serializer = FollowBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        names = serializer.validated_data
+        authors = User.objects.in_bulk(
+            [name for group in names.values() for name in group],
+            field_name='username')
+        user = request.user
+        result = {'follow': {}, 'unfollow': {}}
+        with transaction.atomic():
+            # Повторы имён в списке учитываются один раз
+            for name in dict.fromkeys(names.get('follow', [])):
+                author = authors.get(name)
+                if author is None:
+                    outcome = 'not_found'
+                elif author == user:
+                    outcome = 'self'
+                elif follows.follow(user, author):
+                    outcome = 'followed'
+                else:
+                    outcome = 'already_following'
+                result['follow'][name] = outcome
+            for name in dict.fromkeys(names.get('unfollow', [])):
+                author = authors.get(name)
+                if author is None:
+                    outcome = 'not_found'
+                elif follows.unfollow(user, author):
+                    outcome = 'unfollowed'
+                else:
+                    outcome = 'not_following'
+                result['unfollow'][name] = outcome
+        return Response(result)
+
+
+class RecommendationViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """Кого почитать: готовый список, построенный командой
+    build_recommendations, читается одним запросом по индексу."""
+    serializer_class = RecommendationSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = None
+
+    def get_queryset(self):
+        return recommendations.for_user(
+            self.request.user, settings.RECOMMENDATIONS_COUNT)
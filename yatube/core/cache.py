@@ -0,0 +1,282 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS cache_entries (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        expires REAL,
+        accessed REAL NOT NULL,
+        size INTEGER NOT NULL
+    )''',
+    'CREATE INDEX IF NOT EXISTS cache_entries_accessed '
+    'ON cache_entries (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_entries_expires '
+    'ON cache_entries (expires)',
+    # Число записей и общий размер ведутся триггерами, чтобы проверка
+    # лимитов не просматривала всю таблицу
+    '''CREATE TABLE IF NOT EXISTS cache_totals (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        entries INTEGER NOT NULL,
+        bytes INTEGER NOT NULL
+    )''',
+    'INSERT OR IGNORE INTO cache_totals VALUES (1, 0, 0)',
+    '''CREATE TRIGGER IF NOT EXISTS cache_entries_insert
+        AFTER INSERT ON cache_entries BEGIN
+        UPDATE cache_totals
+        SET entries = entries + 1, bytes = bytes + NEW.size;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS cache_entries_delete
+        AFTER DELETE ON cache_entries BEGIN
+        UPDATE cache_totals
+        SET entries = entries - 1, bytes = bytes - OLD.size;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS cache_entries_update
+        AFTER UPDATE OF size ON cache_entries BEGIN
+        UPDATE cache_totals SET bytes = bytes - OLD.size + NEW.size;
+    END''',
+)
+
+# Время последнего обращения обновляется не чаще раза в секунду,
+# чтобы чтение популярных ключей не превращалось в запись
+ACCESS_RESOLUTION = 1
+INTEGER_SIZE = 8
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite в режиме WAL, общий для всех процессов
+    на одной машине.
+
+    LOCATION — путь к файлу. Кроме стандартных MAX_ENTRIES
+    и CULL_FREQUENCY, в OPTIONS можно задать MAX_SIZE — предельный
+    размер значений в байтах. При превышении лимитов сначала удаляются
+    просроченные записи, затем давно не читавшиеся. Целые числа
+    хранятся как есть, поэтому incr выполняется одним UPDATE.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        options = params.get('OPTIONS', {})
+        self._max_size = int(options.get('MAX_SIZE', 0))
+        self._local = threading.local()
+
+    @property
+    def _connection(self):
+        # Соединение своё у каждого потока и у каждого процесса после fork
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            connection = sqlite3.connect(
+                self._path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = pid
+        return self._local.connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def _encode(value):
+        if type(value) is int:
+            return value, INTEGER_SIZE
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        return data, len(data)
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _write(self, sql, params):
+        """Запись и проверка лимитов в одной транзакции."""
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            changed = connection.execute(sql, params).rowcount
+            self._cull(connection)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return changed
+
+    def _over_limits(self, connection):
+        entries, size = connection.execute(
+            'SELECT entries, bytes FROM cache_totals').fetchone()
+        return entries, (
+            entries > self._max_entries
+            or (self._max_size and size > self._max_size)
+        )
+
+    def _cull(self, connection):
+        entries, over = self._over_limits(connection)
+        if not over:
+            return
+        connection.execute(
+            'DELETE FROM cache_entries WHERE expires <= ?', (time.time(),))
+        entries, over = self._over_limits(connection)
+        if over and self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache_entries')
+            return
+        while over and entries:
+            # Удаляем давно не читавшиеся записи той же долей,
+            # что и встроенные бэкенды Django
+            count = max(entries // self._cull_frequency, 1)
+            connection.execute(
+                'DELETE FROM cache_entries WHERE key IN ('
+                'SELECT key FROM cache_entries ORDER BY accessed LIMIT ?)',
+                (count,))
+            entries, over = self._over_limits(connection)
+
+    def _too_large(self, size):
+        # Значение больше MAX_SIZE не поместится, и при очистке
+        # вытеснило бы весь кэш вместе с собой
+        return self._max_size and size > self._max_size
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        data, size = self._encode(value)
+        if self._too_large(size):
+            return False
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute(
+                'DELETE FROM cache_entries WHERE key = ? AND expires <= ?',
+                (key, now))
+            added = connection.execute(
+                'INSERT INTO cache_entries VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (key) DO NOTHING',
+                (key, data, self.get_backend_timeout(timeout), now, size),
+            ).rowcount
+            self._cull(connection)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return bool(added)
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        row = self._connection.execute(
+            'SELECT value, expires, accessed FROM cache_entries '
+            'WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return default
+        value, expires, accessed = row
+        if expires is not None and expires <= now:
+            self._connection.execute(
+                'DELETE FROM cache_entries WHERE key = ? AND expires <= ?',
+                (key, now))
+            return default
+        if accessed < now - ACCESS_RESOLUTION:
+            self._connection.execute(
+                'UPDATE cache_entries SET accessed = ? WHERE key = ?',
+                (now, key))
+        return self._decode(value)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        made = list(keys)
+        now = time.time()
+        connection = self._connection
+        rows = []
+        # Не больше 999 параметров в запросе для старых SQLite
+        for start in range(0, len(made), 900):
+            chunk = made[start:start + 900]
+            rows += connection.execute(
+                'SELECT key, value, expires, accessed FROM cache_entries '
+                f'WHERE key IN ({", ".join("?" * len(chunk))})',
+                chunk).fetchall()
+        result = {}
+        stale = []
+        for key, value, expires, accessed in rows:
+            if expires is not None and expires <= now:
+                continue
+            if accessed < now - ACCESS_RESOLUTION:
+                stale.append(key)
+            result[keys[key]] = self._decode(value)
+        for start in range(0, len(stale), 900):
+            chunk = stale[start:start + 900]
+            connection.execute(
+                'UPDATE cache_entries SET accessed = ? '
+                f'WHERE key IN ({", ".join("?" * len(chunk))})',
+                [now] + chunk)
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        data, size = self._encode(value)
+        if self._too_large(size):
+            # Старое значение больше не актуально
+            self._connection.execute(
+                'DELETE FROM cache_entries WHERE key = ?', (key,))
+            return
+        self._write(
+            'INSERT INTO cache_entries VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+            'expires = excluded.expires, accessed = excluded.accessed, '
+            'size = excluded.size',
+            (key, data, self.get_backend_timeout(timeout), time.time(), size),
+        )
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        return bool(self._connection.execute(
+            'UPDATE cache_entries SET expires = ?, accessed = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), now, key, now),
+        ).rowcount)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            updated = connection.execute(
+                'UPDATE cache_entries SET value = value + ?, accessed = ? '
+                "WHERE key = ? AND typeof(value) = 'integer' "
+                'AND (expires IS NULL OR expires > ?)',
+                (delta, now, key, now),
+            ).rowcount
+            value = connection.execute(
+                'SELECT value FROM cache_entries WHERE key = ?',
+                (key,)).fetchone()
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        if not updated:
+            raise ValueError("Key '%s' not found" % key)
+        return value[0]
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._connection.execute(
+            'SELECT 1 FROM cache_entries '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time())).fetchone() is not None
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        return bool(self._connection.execute(
+            'DELETE FROM cache_entries WHERE key = ?', (key,)).rowcount)
+
+    def clear(self):
+        self._connection.execute('DELETE FROM cache_entries')
@@ -0,0 +1,101 @@
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache import SQLiteCache
+
+# Значение размером с кэшированную страницу
+PAYLOAD = 'x' * 20000
+
+
+def simulate_worker(args):
+    """Процесс-обработчик: читает страницы из кэша и заполняет
+    промахи. Возвращает число попаданий."""
+    backend, location, params, keys, requests, seed = args
+    cache = backend(location, params)
+    rand = random.Random(seed)
+    hits = 0
+    for _ in range(requests):
+        key = f'page:{rand.randrange(keys)}'
+        if cache.get(key) is None:
+            cache.set(key, PAYLOAD)
+        else:
+            hits += 1
+    return hits
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает LocMemCache и SQLiteCache: скорость операций в одном '
+        'процессе и долю попаданий при нескольких процессах'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--operations', type=int, default=5000,
+            help='Сколько раз выполнить каждую операцию'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Сколько процессов-обработчиков запустить'
+        )
+        parser.add_argument(
+            '--keys', type=int, default=1000,
+            help='Сколько разных страниц запрашивают обработчики'
+        )
+
+    def handle(self, *args, **options):
+        operations = options['operations']
+        params = {'OPTIONS': {'MAX_ENTRIES': operations + options['keys']}}
+        with tempfile.TemporaryDirectory() as directory:
+            backends = (
+                ('locmem', LocMemCache, 'benchmark'),
+                ('sqlite', SQLiteCache,
+                 os.path.join(directory, 'cache.sqlite3')),
+            )
+            for name, backend, location in backends:
+                cache = backend(location, params)
+                rates = self.measure(cache, operations)
+                hit_rate = self.simulate(backend, location, params, options)
+                self.stdout.write(
+                    f'{name:<8}'
+                    + ''.join(f'{op} {rate:>9.0f}/с  '
+                              for op, rate in rates)
+                    + f'попаданий при {options["workers"]} процессах: '
+                    + f'{hit_rate:.0%}'
+                )
+
+    def measure(self, cache, operations):
+        """Операций в секунду для set, get и incr."""
+        cache.clear()
+        cache.set('counter', 0)
+        steps = (
+            ('set', lambda i: cache.set(f'key:{i}', PAYLOAD)),
+            ('get', lambda i: cache.get(f'key:{i}')),
+            ('incr', lambda i: cache.incr('counter')),
+        )
+        rates = []
+        for op, step in steps:
+            start = time.perf_counter()
+            for i in range(operations):
+                step(i)
+            rates.append((op, operations / (time.perf_counter() - start)))
+        cache.clear()
+        return rates
+
+    def simulate(self, backend, location, params, options):
+        workers = options['workers']
+        requests = options['operations']
+        jobs = [
+            (backend, location, params, options['keys'], requests, seed)
+            for seed in range(workers)
+        ]
+        context = multiprocessing.get_context('fork')
+        with context.Pool(workers) as pool:
+            hits = sum(pool.map(simulate_worker, jobs))
+        return hits / (workers * requests)
@@ -0,0 +1,245 @@
+import base64
+import hashlib
+import json
+import re
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.utils.safestring import mark_safe
+
+# Страница кэшируется одна на всех посетителей. Всё, что зависит от
+# посетителя (шапка, кнопка подписки), в кэш попадает «дыркой» —
+# меткой, на место которой фрагмент дорисовывается при каждом ответе.
+HOLE = '<!--hole:{}-->'
+HOLE_RE = re.compile(r'<!--hole:([A-Za-z0-9_=-]+)-->')
+
+# Функции, добавляющие в контекст фрагмента данные посетителя
+_providers = {}
+
+
+def fragment(template_name):
+    """Регистрирует функцию контекста для фрагмента template_name.
+
+    Функция получает request и параметры метки и возвращает словарь,
+    который добавляется к контексту фрагмента.
+    """
+    def decorator(func):
+        _providers[template_name] = func
+        return func
+    return decorator
+
+
+def fragment_context(request, template_name, params):
+    context = dict(params)
+    provider = _providers.get(template_name)
+    if provider is not None:
+        context.update(provider(request, params))
+    return context
+
+
+def is_punching(request):
+    """Рисуется ли сейчас общая для всех посетителей заготовка."""
+    return getattr(request, 'punch_holes', False)
+
+
+def make_hole(template_name, params):
+    raw = json.dumps([template_name, params], default=str)
+    return mark_safe(
+        HOLE.format(base64.urlsafe_b64encode(raw.encode()).decode()))
+
+
+def fill_holes(request, content):
+    """Дорисовывает фрагменты посетителя на место меток."""
+    def render_hole(match):
+        raw = base64.urlsafe_b64decode(match.group(1).encode()).decode()
+        template_name, params = json.loads(raw)
+        return render_to_string(
+            template_name,
+            fragment_context(request, template_name, params),
+            request=request,
+        )
+    return HOLE_RE.sub(render_hole, content)
+
+
+# Версия области (главная, профиль, группа, пост) входит в ключ каждой
+# страницы этой области. Изменение данных увеличивает версию, и старые
+# копии страниц просто перестают находиться.
+VERSION_KEY = 'page-version:{}'
+# Время последнего изменения области в секундах, для Last-Modified
+CHANGED_KEY = 'page-changed:{}'
+# Общая область всех страниц: для редких изменений, которые видны везде
+ALL_PAGES = 'pages'
+
+
+def viewer_scope(user_id):
+    """Область посетителя: данные его фрагментов, которые не относятся
+    ни к одной странице (например, рекомендации). Входит в ETag всех
+    страниц этого посетителя, но не в ключ общей копии страницы."""
+    return f'viewer:{user_id}'
+
+
+def _new_version():
+    # Начальная версия берётся из времени, чтобы после вытеснения
+    # счётчика из кэша не вернулись ключи старых страниц
+    return int(time.time() * 1000)
+
+
+def get_versions(scopes):
+    return get_state(scopes)[0]
+
+
+def get_state(scopes):
+    """Версии областей и время последнего изменения любой из них.
+
+    Версии — счётчики и для дат не годятся: увеличение на единицу не
+    сдвигает время, заложенное в начальное значение. Поэтому время
+    изменения хранится рядом отдельным ключом и читается тем же
+    запросом к кэшу.
+    """
+    version_keys = [VERSION_KEY.format(scope) for scope in scopes]
+    changed_keys = [CHANGED_KEY.format(scope) for scope in scopes]
+    values = cache.get_many(version_keys + changed_keys)
+    versions = []
+    changed_at = 0
+    for version_key, changed_key in zip(version_keys, changed_keys):
+        if version_key not in values:
+            cache.add(version_key, _new_version(), None)
+            values[version_key] = cache.get(version_key)
+        version = values[version_key]
+        versions.append(version)
+        # Без записи об изменении область не менялась с создания
+        # версии, а начальная версия — время создания
+        changed_at = max(
+            changed_at, values.get(changed_key, version // 1000))
+    return versions, changed_at
+
+
+def _bump(scopes):
+    now = int(time.time())
+    for scope in scopes:
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), None)
+        cache.set(CHANGED_KEY.format(scope), now, None)
+
+
+def invalidate(*scopes):
+    """Сбрасывает кэш страниц перечисленных областей."""
+    _bump(scopes)
+    # Пока транзакция не зафиксирована, параллельный запрос может
+    # закэшировать под новой версией старые данные, поэтому внутри
+    # транзакции версия увеличивается ещё раз после фиксации
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _bump(scopes))
+
+
+def page_key(request, versions):
+    url = request.build_absolute_uri()
+    return 'page:{}:{}'.format(
+        hashlib.md5(url.encode()).hexdigest(),
+        '.'.join(str(version) for version in versions))
+
+
+def validators(request, versions, changed_at, *extra):
+    """ETag и Last-Modified ответа по состоянию его областей.
+
+    Версии меняются при каждом изменении данных области, поэтому
+    валидаторы считаются по одному запросу к кэшу, без базы и без
+    отрисовки. В ETag входит посетитель: персональные фрагменты
+    у каждого свои. Входит и CSRF-токен: формы во фрагментах содержат
+    его, и после нового входа копия со старым токеном не годится.
+    Last-Modified — время последнего изменения.
+    """
+    user = getattr(request, 'user', None)
+    raw = '{}|{}|{}|{}|{}'.format(
+        request.get_full_path(),
+        getattr(user, 'pk', None),
+        request.META.get('CSRF_COOKIE', ''),
+        '.'.join(str(version) for version in versions),
+        '|'.join(str(value) for value in extra),
+    )
+    etag = 'W/"{}"'.format(hashlib.md5(raw.encode()).hexdigest())
+    return etag, changed_at
+
+
+def not_modified(request, etag, last_modified):
+    """Ответ 304, если у клиента актуальная копия, иначе None."""
+    return get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+
+
+def set_validators(response, etag, last_modified):
+    if response.status_code == 200:
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # Ответ персональный и перед каждым показом сверяется
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _viewer_scopes(request):
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return []
+    return [viewer_scope(user.pk)]
+
+
+def cache_shared_page(*scopes, timeout=None):
+    """Замена cache_page, которая хранит одну копию страницы на всех
+    посетителей, а персональные фрагменты дорисовывает при ответе.
+
+    Области страницы — шаблоны, которые заполняются аргументами
+    view-функции, например 'profile:{username}'. Страница живёт
+    в кэше, пока не изменится версия одной из её областей. Версии
+    служат и валидаторами: на условный запрос с актуальной копией
+    страница отвечает 304, не трогая ни кэш страниц, ни шаблоны.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            page_scopes = [ALL_PAGES] + [
+                scope.format(**kwargs) for scope in scopes]
+            versions, changed_at = get_state(
+                page_scopes + _viewer_scopes(request))
+            # Токен нужен до расчёта ETag, даже если страница
+            # ещё не отрисована и его не запрашивала
+            get_token(request)
+            etag, last_modified = validators(request, versions, changed_at)
+            response = not_modified(request, etag, last_modified)
+            if response is not None:
+                return response
+            key = page_key(request, versions[:len(page_scopes)])
+            shell = cache.get(key)
+            if shell is not None:
+                return set_validators(
+                    HttpResponse(fill_holes(request, shell)),
+                    etag, last_modified)
+            request.punch_holes = True
+            try:
+                response = view(request, *args, **kwargs)
+            finally:
+                request.punch_holes = False
+            if response.streaming:
+                return response
+            shell = response.content.decode(response.charset)
+            if response.status_code == 200:
+                page_timeout = timeout
+                if page_timeout is None:
+                    page_timeout = settings.PAGE_CACHE_TIMEOUT
+                cache.set(key, shell, page_timeout)
+            response.content = fill_holes(request, shell)
+            return set_validators(response, etag, last_modified)
+        return wrapper
+    return decorator
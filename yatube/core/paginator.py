@@ -0,0 +1,145 @@
+import base64
+import binascii
+import heapq
+from collections import namedtuple
+
+from django.core.paginator import Paginator
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+
+# Источник ленты: queryset, поле с id поста и, если queryset отдаёт
+# не сами посты, а ссылающиеся на них записи, — имя связи с постом
+Source = namedtuple(
+    'Source', ('queryset', 'id_field', 'related'), defaults=('pk', None)
+)
+
+
+def encode_cursor(position):
+    """Курсор — позиция в ленте: дата публикации и id поста."""
+    pub_date, pk = position
+    raw = f'{pub_date.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Возвращает (pub_date, id) или None, если курсор испорчен."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        pub_date, pk = raw.split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+def older_than(position, id_field='pk'):
+    pub_date, pk = position
+    return (
+        Q(pub_date__lt=pub_date)
+        | Q(pub_date=pub_date, **{f'{id_field}__lt': pk})
+    )
+
+
+def newer_than(position, id_field='pk'):
+    pub_date, pk = position
+    return (
+        Q(pub_date__gt=pub_date)
+        | Q(pub_date=pub_date, **{f'{id_field}__gt': pk})
+    )
+
+
+class KeysetPaginator(Paginator):
+    """Постраничный вывод по ключу (pub_date, id).
+
+    В отличие от стандартного Paginator не выполняет COUNT(*) и не
+    использует OFFSET: следующая страница выбирается условием
+    «старше последнего поста на текущей странице». Номер страницы
+    передаётся в ссылках только для отображения.
+
+    Вместо queryset можно передать список источников Source: каждый
+    читается по своему индексу, а результаты сливаются при чтении.
+    """
+
+    def __init__(self, object_list, per_page):
+        super().__init__(object_list, per_page)
+        if isinstance(object_list, QuerySet):
+            self.sources = [Source(object_list)]
+        else:
+            self.sources = list(object_list)
+        self._num_pages = 1
+
+    @property
+    def num_pages(self):
+        # Известно только, есть ли страница после текущей
+        return self._num_pages
+
+    def _read(self, source, position, newer, start, stop):
+        """Пары (ключ, объект) из одного источника по порядку ленты."""
+        id_field = source.id_field
+        if newer:
+            queryset = source.queryset.order_by('pub_date', id_field)
+            if position:
+                queryset = queryset.filter(newer_than(position, id_field))
+        else:
+            queryset = source.queryset.order_by(
+                '-pub_date', f'-{id_field}')
+            if position:
+                queryset = queryset.filter(older_than(position, id_field))
+        rows = []
+        for obj in queryset[start:stop]:
+            key = (obj.pub_date, getattr(obj, id_field))
+            if source.related:
+                obj = getattr(obj, source.related)
+            rows.append((key, obj))
+        return rows
+
+    def _fetch(self, position=None, newer=False, offset=0):
+        # Берём на одну запись больше, чтобы узнать, есть ли продолжение
+        limit = self.per_page + 1
+        if len(self.sources) == 1:
+            rows = self._read(
+                self.sources[0], position, newer, offset, offset + limit)
+        else:
+            merged = heapq.merge(
+                *(self._read(source, position, newer, 0, offset + limit)
+                  for source in self.sources),
+                key=lambda row: row[0],
+                reverse=not newer,
+            )
+            # Один и тот же пост может прийти из нескольких источников
+            rows = []
+            for row in merged:
+                if not rows or rows[-1][0] != row[0]:
+                    rows.append(row)
+            rows = rows[offset:offset + limit]
+        return rows[:self.per_page], len(rows) > self.per_page
+
+    def get_page(self, number=None, after=None, before=None):
+        """Страница после курсора after (старее), перед курсором before
+        (новее) или, для ссылок без курсора, по номеру."""
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        after = after and decode_cursor(after)
+        before = before and decode_cursor(before)
+        if after:
+            rows, has_next = self._fetch(after)
+            number = max(number, 2)
+        elif before:
+            rows, has_previous = self._fetch(before, newer=True)
+            rows.reverse()
+            has_next = True
+            number = max(number, 2) if has_previous else 1
+        else:
+            rows, has_next = self._fetch(offset=(number - 1) * self.per_page)
+        self._num_pages = number + 1 if has_next else number
+        page = self._get_page([obj for _, obj in rows], number, self)
+        page.next_cursor = encode_cursor(rows[-1][0]) if has_next else None
+        page.previous_cursor = (
+            encode_cursor(rows[0][0]) if rows and number > 1 else None
+        )
+        return page
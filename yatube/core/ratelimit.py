@@ -0,0 +1,103 @@
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+
+KEY = 'ratelimit:{}:{}'
+
+
+def client_ip(request):
+    """IP гостя.
+
+    За обратным прокси REMOTE_ADDR у всех один — адрес прокси, поэтому
+    адрес клиента берём из заголовка settings.RATELIMIT_IP_HEADER
+    (например, HTTP_X_FORWARDED_FOR). В X-Forwarded-For клиент может
+    дописать что угодно слева, доверяем только последнему адресу — его
+    добавил наш прокси. Без настройки заголовок не читается: иначе
+    любой клиент подменил бы себе IP.
+    """
+    header = settings.RATELIMIT_IP_HEADER
+    if header:
+        forwarded = request.META.get(header, '').split(',')[-1].strip()
+        if forwarded:
+            return forwarded
+    return request.META.get('REMOTE_ADDR')
+
+
+def _identity(request):
+    """Кого ограничиваем: вошедшего пользователя, а гостя — по IP."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return 'user', user.pk
+    return 'ip', client_ip(request)
+
+
+def hit(request, scope):
+    """Забираем из корзины токен на запрос.
+
+    Корзина на count запросов наполняется за period секунд (алгоритм
+    GCRA): в кэше хранится момент, когда она снова станет полной, и
+    каждый запрос атомарно сдвигает его на period / count. Если этот
+    момент уже в прошлом, корзина полна, и отсчёт начинается заново от
+    текущего времени — иначе после простоя накопились бы лишние
+    токены. Разрешённый запрос стоит одного incr, после простоя —
+    ещё одного set.
+
+    Запись хранится без срока: устаревшая запись ничего не разрешает
+    сверх лимита, а место под неё освобождает вытеснение в кэше.
+
+    Возвращает None, если запрос разрешён, иначе сколько секунд ждать.
+    """
+    kind, ident = _identity(request)
+    limit = settings.RATE_LIMITS.get(scope, {}).get(kind)
+    if limit is None:
+        return None
+    count, period = limit
+    interval = period * 1000 // count
+    key = KEY.format(scope, f'{kind}:{ident}')
+    now = int(time.time() * 1000)
+    try:
+        full_at = cache.incr(key, interval)
+    except ValueError:
+        full_at = now + interval
+        if not cache.add(key, full_at, None):
+            full_at = cache.incr(key, interval)
+    if full_at - interval < now:
+        # tat = max(tat, now). Одновременный запрос может так же
+        # сбросить запись, и тогда один токен не спишется
+        full_at = now + interval
+        cache.set(key, full_at, None)
+    excess = full_at - now - period * 1000
+    if excess <= 0:
+        return None
+    # Отклонённый запрос токен не тратит
+    try:
+        cache.decr(key, interval)
+    except ValueError:
+        pass
+    return math.ceil(excess / 1000)
+
+
+def ratelimit(scope, methods=('POST',)):
+    """Ограничивает частоту запросов к view-функции методами methods.
+
+    Лимиты берутся из settings.RATE_LIMITS[scope]; сверх лимита
+    отвечаем 429 с заголовком Retry-After.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                wait = hit(request, scope)
+                if wait is not None:
+                    response = render(
+                        request, 'core/429.html', {'wait': wait},
+                        status=429)
+                    response['Retry-After'] = str(wait)
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,21 @@
+from django import template
+
+from core import page_cache
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, template_name, **params):
+    """Фрагмент, зависящий от посетителя.
+
+    В кэшируемой заготовке страницы выводит метку, на остальных
+    страницах рисуется на месте, как include.
+    """
+    request = context.get('request')
+    if page_cache.is_punching(request):
+        return page_cache.make_hole(template_name, params)
+    fragment = context.template.engine.get_template(template_name)
+    values = page_cache.fragment_context(request, template_name, params)
+    with context.push(**values):
+        return fragment.render(context)
@@ -1,11 +1,14 @@
-from django.core.paginator import Paginator
+from .paginator import KeysetPaginator
 
 
 amount = 10  # Количество постов на странице
 
 
 def get_paginator(request, post_list):
-    paginator = Paginator(post_list, amount)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = KeysetPaginator(post_list, amount)
+    page_obj = paginator.get_page(
+        request.GET.get('page'),
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
     return page_obj
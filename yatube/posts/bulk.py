@@ -0,0 +1,62 @@
+from django.db import connection
+
+from core import page_cache
+
+from . import counters, search, timeline
+from .models import Comment, Post
+
+BATCH_SIZE = 500  # Сколько строк вставляется одним INSERT
+
+
+def _insert(model, objs):
+    """bulk_create, после которого у объектов есть id.
+
+    Django 2.2 не получает id из SQLite после массовой вставки. Внутри
+    транзакции SQLite держит блокировку записи, а AUTOINCREMENT выдаёт
+    id по возрастанию, поэтому вставленные строки — последние len(objs)
+    строк таблицы. Вне транзакции или на другой СУБД так читать id
+    нельзя, и это ошибка вызывающего кода.
+    """
+    model.objects.bulk_create(objs, batch_size=BATCH_SIZE)
+    if objs and objs[0].pk is None:
+        if connection.vendor != 'sqlite' or not connection.in_atomic_block:
+            raise RuntimeError(
+                'id после массовой вставки читаются только в транзакции '
+                'SQLite')
+        ids = list(model.objects.order_by('-id').values_list(
+            'id', flat=True)[:len(objs)])
+        for obj, pk in zip(objs, reversed(ids)):
+            obj.pk = pk
+    return objs
+
+
+def create_posts(author, posts):
+    """Сохраняем пачку постов автора одной массовой вставкой.
+
+    bulk_create не отправляет сигналы, поэтому всё, что при создании
+    одного поста делают обработчики из signals, здесь делается один
+    раз на пачку. Вызывать внутри транзакции.
+    """
+    for post in posts:
+        post.author = author
+    _insert(Post, posts)
+    counters.change_user(author.id, 'posts_count', len(posts))
+    search.index_posts(posts)
+    timeline.push_posts(author.id, posts)
+    group_slugs = {post.group.slug for post in posts if post.group_id}
+    page_cache.invalidate(
+        'index', f'profile:{author.username}',
+        *(f'group:{slug}' for slug in group_slugs))
+    return posts
+
+
+def create_comments(author, post, comments):
+    """Сохраняем пачку комментариев к посту, как create_posts."""
+    for comment in comments:
+        comment.author = author
+        comment.post = post
+    _insert(Comment, comments)
+    counters.change_comments(post.id, len(comments))
+    counters.change_user(author.id, 'comments_count', len(comments))
+    page_cache.invalidate(f'post:{post.id}', 'comments')
+    return comments
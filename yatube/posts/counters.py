@@ -0,0 +1,104 @@
+from django.db.models import Count, F
+
+from .models import Comment, Follow, Post, UserStats
+
+
+def recount_user(user_id):
+    """Пересчитываем счётчики пользователя по базе."""
+    stats, _ = UserStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'posts_count': Post.objects.filter(author_id=user_id).count(),
+            'followers_count': Follow.objects.filter(
+                author_id=user_id).count(),
+            'following_count': Follow.objects.filter(
+                user_id=user_id).count(),
+            'comments_count': Comment.objects.filter(
+                author_id=user_id).count(),
+        }
+    )
+    return stats
+
+
+def change_user(user_id, field, delta):
+    """Атомарно меняем счётчик пользователя на delta."""
+    stats = UserStats.objects.filter(user_id=user_id)
+    # Счётчик беззнаковый: уменьшение ниже нуля уронило бы запрос с
+    # IntegrityError, поэтому уменьшаем только достаточно большой
+    updated = (stats if delta > 0 else stats.filter(
+        **{f'{field}__gte': -delta})).update(**{field: F(field) + delta})
+    if updated:
+        return
+    # Записи нет: пользователь создан до появления счётчиков или
+    # удаляется вместе со своими постами и подписками. Если же запись
+    # есть, счётчик разошёлся с базой — пересчитываем
+    if delta > 0 or stats.exists():
+        recount_user(user_id)
+
+
+def change_comments(post_id, delta):
+    posts = Post.objects.filter(id=post_id)
+    updated = (posts if delta > 0 else posts.filter(
+        comments_count__gte=-delta)).update(
+        comments_count=F('comments_count') + delta
+    )
+    if not updated and delta < 0:
+        reconcile_posts([post_id])
+
+
+def get_stats(user):
+    """Счётчики пользователя; если записи ещё нет, она создаётся."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return recount_user(user.id)
+
+
+def reconcile_users(user_ids):
+    """Сверяем счётчики пачки пользователей с базой и исправляем
+    расхождения. Возвращает количество исправленных записей."""
+    actual = {
+        user_id: UserStats(user_id=user_id) for user_id in user_ids
+    }
+    totals = (
+        ('posts_count', Post.objects, 'author_id'),
+        ('followers_count', Follow.objects, 'author_id'),
+        ('following_count', Follow.objects, 'user_id'),
+        ('comments_count', Comment.objects, 'author_id'),
+    )
+    for field, manager, key in totals:
+        rows = manager.filter(**{f'{key}__in': user_ids}).order_by(
+        ).values(key).annotate(total=Count('id')).values_list(key, 'total')
+        for user_id, total in rows:
+            setattr(actual[user_id], field, total)
+    stored = UserStats.objects.in_bulk(user_ids)
+    fields = [field for field, _, _ in totals]
+    missing = [stats for user_id, stats in actual.items()
+               if user_id not in stored]
+    drifted = [
+        stats for user_id, stats in actual.items()
+        if user_id in stored and any(
+            getattr(stats, field) != getattr(stored[user_id], field)
+            for field in fields
+        )
+    ]
+    UserStats.objects.bulk_create(missing)
+    UserStats.objects.bulk_update(drifted, fields)
+    return len(missing) + len(drifted)
+
+
+def reconcile_posts(post_ids):
+    """Сверяем счётчики комментариев пачки постов с базой."""
+    actual = dict(
+        Comment.objects.filter(post_id__in=post_ids).order_by().values(
+            'post_id').annotate(total=Count('id')).values_list(
+            'post_id', 'total')
+    )
+    drifted = [
+        Post(id=post_id, comments_count=actual.get(post_id, 0))
+        for post_id, stored in Post.objects.filter(
+            id__in=post_ids).values_list('id', 'comments_count')
+        if stored != actual.get(post_id, 0)
+    ]
+    Post.objects.bulk_update(drifted, ['comments_count'])
+    return len(drifted)
@@ -0,0 +1,51 @@
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+
+from .models import Follow
+
+# Подписка и отписка — по одному запросу без предварительной проверки:
+# вставка пропускает уже существующую пару (user, author), удаление
+# удаляет то, что есть. Параллельные запросы не приводят к
+# IntegrityError, а повторные ничего не меняют. bulk_create и
+# QuerySet.delete сюда не подходят: первый не сообщает, вставлена ли
+# строка, второй перед удалением читает строки ради сигналов. Поэтому
+# сигналы (счётчики, ленты, кэш страниц) отправляются здесь вручную
+# и только если строка действительно добавлена или удалена.
+
+
+def follow(user, author):
+    """Подписываем user на author. Возвращает True, если подписки
+    ещё не было."""
+    if user.id == author.id:
+        return False
+    # ON CONFLICT понимают и SQLite (3.24+), и PostgreSQL
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO posts_follow (user_id, author_id) VALUES (%s, %s) '
+            'ON CONFLICT (user_id, author_id) DO NOTHING',
+            [user.id, author.id]
+        )
+        created = cursor.rowcount == 1
+    if created:
+        post_save.send(
+            sender=Follow, instance=Follow(user=user, author=author),
+            created=True, update_fields=None, raw=False,
+            using=connection.alias,
+        )
+    return created
+
+
+def unfollow(user, author):
+    """Отписываем user от author. Возвращает True, если подписка была."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'DELETE FROM posts_follow WHERE user_id = %s AND author_id = %s',
+            [user.id, author.id]
+        )
+        deleted = cursor.rowcount == 1
+    if deleted:
+        post_delete.send(
+            sender=Follow, instance=Follow(user=user, author=author),
+            using=connection.alias,
+        )
+    return deleted
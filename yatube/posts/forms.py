@@ -1,4 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+
+from .images import ingest
 from .models import Post, Comment
 
 
@@ -7,6 +10,18 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if image is False:
+            # Картинку убрали
+            self.instance.image_width = self.instance.image_height = None
+        if not isinstance(image, UploadedFile):
+            return image
+        image, width, height = ingest(image)
+        self.instance.image_width = width
+        self.instance.image_height = height
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,84 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from PIL import Image, ImageOps
+
+# Параметры сохранения: метаданные (EXIF, комментарии) не переносятся
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'GIF': {'optimize': True},
+}
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'GIF': '.gif'}
+# Если картинка не помещается в IMAGE_MAX_BYTES, сторона уменьшается
+# в SHRINK_STEP раз, но не меньше MIN_SIDE
+SHRINK_STEP = 0.75
+MIN_SIDE = 320
+# Результат пишется в память, пока не превысит этот размер, затем
+# переносится во временный файл
+SPOOL_SIZE = 512 * 1024
+
+
+def _output_format(image):
+    if image.format in ('JPEG', 'PNG', 'GIF'):
+        return image.format
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or (
+        'transparency' in image.info)
+    return 'PNG' if has_alpha else 'JPEG'
+
+
+def _prepare(image, output_format):
+    # Поворот из EXIF применяется до того, как метаданные будут отброшены
+    image = ImageOps.exif_transpose(image)
+    if output_format == 'JPEG':
+        return image.convert('L' if image.mode in ('1', 'L') else 'RGB')
+    if image.mode == 'P':
+        # Палитровые картинки уменьшаются только в полноцветном режиме
+        return image.convert('RGBA')
+    return image
+
+
+def ingest(upload):
+    """Уменьшаем и пересохраняем загруженную картинку.
+
+    Возвращает (файл, ширина, высота). JPEG декодируется сразу
+    в уменьшенном масштабе, остальные форматы ограничены числом
+    пикселей, поэтому память на загрузку не зависит от размера
+    исходного файла. Результат не больше IMAGE_MAX_SIDE по каждой
+    стороне и, если возможно, не больше IMAGE_MAX_BYTES.
+    """
+    max_side = settings.IMAGE_MAX_SIDE
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+        width, height = image.size
+        if image.format == 'JPEG':
+            image.draft('RGB', (max_side, max_side))
+        elif width * height > settings.IMAGE_MAX_PIXELS:
+            raise ValidationError(
+                'Слишком большая картинка: %(width)s×%(height)s',
+                code='image_too_large',
+                params={'width': width, 'height': height},
+            )
+        output_format = _output_format(image)
+        image = _prepare(image, output_format)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError(
+            'Не удалось прочитать картинку', code='invalid_image')
+
+    side = max_side
+    while True:
+        image.thumbnail((side, side), Image.LANCZOS)
+        output = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        image.save(output, output_format, **SAVE_OPTIONS[output_format])
+        if output.tell() <= settings.IMAGE_MAX_BYTES or side <= MIN_SIDE:
+            break
+        output.close()
+        side = max(int(side * SHRINK_STEP), MIN_SIDE)
+    output.seek(0)
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    width, height = image.size
+    return File(output, name=stem + EXTENSIONS[output_format]), width, height
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+from posts.models import Post
+
+
+def sizes_signature():
+    """Отпечаток набора размеров: прогресс от другого набора не годится."""
+    raw = json.dumps(thumbnails.SIZES, sort_keys=True)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def generate(args):
+    """Задача процесса пула: превью всех размеров для одной картинки."""
+    post_id, image_name = args
+    try:
+        thumbnails.generate(Post(id=post_id, image=image_name).image)
+    except Exception as error:
+        return post_id, str(error)
+    return post_id, None
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт превью всех размеров из posts.thumbnails.SIZES для '
+        'картинок всех постов в пуле процессов. Прогресс сохраняется, '
+        'поэтому прерванный запуск продолжается с того же места, если '
+        'набор размеров не изменился'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count(),
+            help='Сколько процессов создают превью; 1 — без пула'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=200,
+            help='Сколько постов обрабатывать между сохранениями прогресса'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default=os.path.join(
+                settings.MEDIA_ROOT, 'cache', 'thumbnail_backfill'),
+            help='Файл, в котором хранится id последнего обработанного '
+                 'поста; удаляется после завершения'
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать заново, не читая сохранённый прогресс'
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint']
+        signature = sizes_signature()
+        last_id = 0 if options['restart'] else self.read_checkpoint(
+            checkpoint, signature)
+        queryset = Post.objects.exclude(image='').order_by('id')
+        total = queryset.filter(id__gt=last_id).count()
+        if last_id:
+            self.stdout.write(f'Продолжаем после поста {last_id}')
+        processes = options['processes']
+        if processes > 1:
+            # Процессы пула открывают свои соединения с базой
+            connections.close_all()
+            pool = multiprocessing.Pool(processes)
+            run = pool.imap_unordered
+        else:
+            pool = None
+            run = map
+        done = failed = 0
+        start = time.monotonic()
+        try:
+            while True:
+                batch = list(queryset.filter(id__gt=last_id).values_list(
+                    'id', 'image')[:options['batch_size']])
+                if not batch:
+                    break
+                for post_id, error in run(generate, batch):
+                    if error:
+                        failed += 1
+                        self.stderr.write(f'Пост {post_id}: {error}')
+                done += len(batch)
+                last_id = batch[-1][0]
+                self.write_checkpoint(checkpoint, signature, last_id)
+                self.report(done, total, time.monotonic() - start)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        # Всё готово: следующий запуск, например после смены размеров,
+        # должен пройти все посты заново
+        self.delete_checkpoint(checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {done} картинок, ошибок: {failed}'))
+
+    def report(self, done, total, elapsed):
+        rate = done / elapsed if elapsed else 0
+        left = (total - done) / rate if rate else 0
+        self.stdout.write(
+            f'{done}/{total} картинок, {rate:.1f} в секунду, '
+            f'осталось примерно {left:.0f} с'
+        )
+
+    @staticmethod
+    def read_checkpoint(path, signature):
+        try:
+            with open(path) as checkpoint:
+                saved, last_id = checkpoint.read().strip().split(':')
+                return int(last_id) if saved == signature else 0
+        except (OSError, ValueError):
+            return 0
+
+    @staticmethod
+    def write_checkpoint(path, signature, last_id):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Запись через временный файл: прерывание не испортит прогресс
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as checkpoint:
+            checkpoint.write(f'{signature}:{last_id}')
+        os.replace(temporary, path)
+
+    @staticmethod
+    def delete_checkpoint(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,45 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит граф подписок в памяти и записывает для каждого '
+        'пользователя авторов с наибольшим числом общих подписок'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count', type=int, default=settings.RECOMMENDATIONS_COUNT,
+            help='Сколько авторов рекомендовать каждому пользователю'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Для скольких пользователей записывать рекомендации '
+                 'за одну транзакцию'
+        )
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        graph = recommendations.FollowGraph.load()
+        self.stdout.write(
+            f'Граф: {len(graph.ids)} пользователей, '
+            f'{len(graph.targets)} подписок, '
+            f'{time.monotonic() - start:.1f} с'
+        )
+        users = rows = 0
+        for user_ids, batch in recommendations.build(
+                graph, options['count'], options['batch_size']):
+            with transaction.atomic():
+                recommendations.save_batch(user_ids, batch)
+            users += len(user_ids)
+            rows += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {rows} рекомендаций для {users} пользователей '
+            f'за {time.monotonic() - start:.1f} с'
+        ))
@@ -0,0 +1,118 @@
+import inspect
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api import views as api_views
+from core.paginator import encode_cursor
+from posts import views
+from posts.models import Comment, Follow, Post
+
+# Признаки плохого плана: полный просмотр таблицы и сортировка
+# во временном B-дереве
+FULL_SCAN_PREFIXES = ('SCAN TABLE ', 'SCAN ')
+INDEXED_SCAN_MARKERS = ('USING INDEX', 'USING COVERING INDEX',
+                        'USING INTEGER PRIMARY KEY', 'CONSTANT ROW')
+TEMP_BTREE_MARKER = 'USE TEMP B-TREE'
+SUBQUERY_PREFIXES = ('CO-ROUTINE ', 'MATERIALIZE ')
+
+
+def plan_problems(plan):
+    """Строки плана EXPLAIN QUERY PLAN, которые считаются проблемой."""
+    problems = []
+    # Просмотр результата подзапроса из FROM — это строки, которые
+    # подзапрос уже выбрал, а не таблица
+    subqueries = {
+        row[-1].split(' ', 1)[1] for row in plan
+        if row[-1].startswith(SUBQUERY_PREFIXES)
+    }
+    for row in plan:
+        detail = row[-1]
+        if TEMP_BTREE_MARKER in detail:
+            problems.append(detail)
+        elif detail.startswith(FULL_SCAN_PREFIXES) and not any(
+                marker in detail for marker in INDEXED_SCAN_MARKERS):
+            if detail.split(' ')[-1] not in subqueries:
+                problems.append(detail)
+    return problems
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет страницы и списки API, проверяет планы всех их '
+        'запросов через EXPLAIN QUERY PLAN и завершается с ошибкой, '
+        'если есть полный просмотр таблицы или сортировка во временном '
+        'B-дереве'
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Проверка планов поддерживает только SQLite')
+        post = Post.objects.exclude(group=None).first()
+        follow = Follow.objects.first()
+        if post is None or follow is None:
+            raise CommandError(
+                'Нужны хотя бы один пост с группой и одна подписка')
+        cursor = {'after': encode_cursor((post.pub_date, post.id))}
+        user = follow.user
+        html = [
+            ('index', views.index, {}, {}),
+            ('index, страница 2', views.index, {}, cursor),
+            ('group_list', views.group_posts,
+             {'slug': post.group.slug}, cursor),
+            ('profile', views.profile,
+             {'username': post.author.username}, cursor),
+            ('post_detail', views.post_detail, {'post_id': post.id}, {}),
+            ('follow_index', views.follow_index, {}, {}),
+            ('follow_index, страница 2', views.follow_index, {}, cursor),
+        ]
+        comment = Comment.objects.first()
+        if comment is not None:
+            html.append((
+                'post_comments', views.post_comments,
+                {'post_id': comment.post_id},
+                {'after': encode_cursor((comment.pub_date, comment.id))},
+            ))
+        api = [
+            ('api posts', api_views.PostViewSet, {}),
+            ('api comments', api_views.CommentViewSet,
+             {'post_id': post.id}),
+            ('api follow', api_views.FollowViewSet, {}),
+            ('api recommendations', api_views.RecommendationViewSet, {}),
+            ('api authors', api_views.UserViewSet, {}),
+        ]
+        failed = False
+        for name, view, kwargs, params in html:
+            request = RequestFactory().get('/', params)
+            request.user = user
+            # Кэш страниц обходим: нужны именно запросы к базе
+            view = inspect.unwrap(view)
+            failed |= self.check_view(name, view, request, kwargs)
+        for name, viewset, kwargs in api:
+            request = APIRequestFactory().get('/')
+            force_authenticate(request, user=user)
+            view = viewset.as_view({'get': 'list'})
+            failed |= self.check_view(name, view, request, kwargs)
+        if failed:
+            raise CommandError('Найдены запросы с плохими планами')
+        self.stdout.write(self.style.SUCCESS('Все планы запросов в порядке'))
+
+    def check_view(self, name, view, request, kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+        failed = False
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                for problem in plan_problems(cursor.fetchall()):
+                    failed = True
+                    self.stderr.write(f'{name}: {problem}\n  {sql}')
+        return failed
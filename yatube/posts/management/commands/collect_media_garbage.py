@@ -0,0 +1,133 @@
+import os
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.kvstores.base import add_prefix
+
+from posts.models import Post
+
+UPLOAD_DIR = Post._meta.get_field('image').upload_to
+THUMBNAIL_EXTENSIONS = tuple(f'.{ext}' for ext in EXTENSIONS.values())
+
+
+def walk(storage, path):
+    """Все файлы каталога хранилища, включая вложенные."""
+    try:
+        directories, files = storage.listdir(path)
+    except FileNotFoundError:
+        return
+    for name in files:
+        yield os.path.join(path, name)
+    for directory in directories:
+        yield from walk(storage, os.path.join(path, directory))
+
+
+class Command(BaseCommand):
+    """Сборка мусора в медиафайлах.
+
+    Записи sorl перебираются и удаляются закрытыми методами хранилища
+    ключей (_find_keys, _get, _delete_raw): открытые delete_thumbnails
+    и cleanup не умеют выбирать записи по постам и работать пачками.
+    Версия sorl закреплена в requirements.txt, а поведение этих методов
+    проверяют тесты: обновляя sorl, запустите test_thumbnails.
+    """
+    help = (
+        'Удаляет картинки, на которые не ссылается ни один пост, их '
+        'превью и записи sorl о них, а также файлы превью без записей'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько файлов и записей удалять за один раз'
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=60 * 60,
+            help='Не трогать файлы моложе стольких секунд: их может '
+                 'сейчас загружать пост, ещё не сохранённый в базе'
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.batch_size = options['batch_size']
+        self.cutoff = timezone.now() - timedelta(seconds=options['min_age'])
+        self.files = self.keys = self.reclaimed = 0
+        kvstore = default.kvstore
+
+        referenced = set(
+            Post.objects.exclude(image='').values_list('image', flat=True)
+            .iterator())
+        self.delete_files(
+            name for name in walk(default_storage, UPLOAD_DIR)
+            if name not in referenced and self.is_old(name)
+        )
+
+        # Превью картинок, которых больше нет у постов
+        live_thumbnails = set()
+        orphan_keys = []
+        for key in kvstore._find_keys(identity='thumbnails'):
+            source = kvstore._get(key)
+            thumbnail_keys = kvstore._get(key, identity='thumbnails') or []
+            orphan = source is None or source.name not in referenced
+            if orphan:
+                orphan_keys += [
+                    add_prefix(key), add_prefix(key, 'thumbnails')]
+            for thumbnail_key in thumbnail_keys:
+                thumbnail = kvstore._get(thumbnail_key)
+                if orphan:
+                    orphan_keys.append(add_prefix(thumbnail_key))
+                elif thumbnail is not None:
+                    live_thumbnails.add(thumbnail.name)
+        self.delete_keys(orphan_keys)
+
+        # Файлы превью, о которых sorl не знает: например, созданные
+        # для размеров, которых больше нет в шаблонах
+        self.delete_files(
+            name for name in walk(
+                default_storage, sorl_settings.THUMBNAIL_PREFIX)
+            if name.endswith(THUMBNAIL_EXTENSIONS)
+            and name not in live_thumbnails and self.is_old(name)
+        )
+
+        verb = 'Будет удалено' if self.dry_run else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} файлов: {self.files}, записей sorl: {self.keys}, '
+            f'освобождено {self.reclaimed / 1024 / 1024:.1f} МБ'
+        ))
+
+    def is_old(self, name):
+        return default_storage.get_modified_time(name) < self.cutoff
+
+    def delete_files(self, names):
+        batch = []
+        for name in names:
+            batch.append(name)
+            if len(batch) >= self.batch_size:
+                self.delete_file_batch(batch)
+                batch = []
+        self.delete_file_batch(batch)
+
+    def delete_file_batch(self, names):
+        for name in names:
+            self.reclaimed += default_storage.size(name)
+            if self.dry_run:
+                self.stdout.write(f'  {name}')
+            else:
+                default_storage.delete(name)
+        self.files += len(names)
+
+    def delete_keys(self, keys):
+        self.keys += len(keys)
+        if self.dry_run:
+            return
+        for start in range(0, len(keys), self.batch_size):
+            default.kvstore._delete_raw(*keys[start:start + self.batch_size])
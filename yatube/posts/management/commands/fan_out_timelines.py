@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = (
+        'Раскладывает по лентам подписчиков посты авторов, которые '
+        'перестали быть «горячими». Запускается по расписанию'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Скольким подписчикам раскладывать посты за одну '
+                 'транзакцию'
+        )
+
+    def handle(self, *args, **options):
+        authors = 0
+        for author_id in timeline.fan_out_pending(options['batch_size']):
+            authors += 1
+            self.stdout.write(f'Автор {author_id}: готово')
+        self.stdout.write(self.style.SUCCESS(f'Авторов: {authors}'))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import page_cache
+from posts import counters
+from posts.models import Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет счётчики постов, комментариев и подписок с базой '
+        'и исправляет расхождения'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько записей обрабатывать за одну транзакцию'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fixed_users = self.reconcile(
+            User.objects.all(), counters.reconcile_users, batch_size)
+        fixed_posts = self.reconcile(
+            Post.objects.all(), counters.reconcile_posts, batch_size)
+        if fixed_users or fixed_posts:
+            # Исправленные счётчики выводятся на страницах из кэша
+            page_cache.invalidate(page_cache.ALL_PAGES)
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено пользователей: {fixed_users}, '
+            f'постов: {fixed_posts}'
+        ))
+
+    def reconcile(self, queryset, reconcile_batch, batch_size):
+        """Проходим таблицу пачками по возрастанию id."""
+        fixed = 0
+        last_id = 0
+        while True:
+            ids = list(queryset.filter(id__gt=last_id).order_by(
+                'id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return fixed
+            with transaction.atomic():
+                fixed += reconcile_batch(ids)
+            last_id = ids[-1]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.28 on 2026-10-17 06:33
+
+from django.db import migrations, models
+
+
+def fill_comments_count(apps, schema_editor):
+    Comment = apps.get_model('posts', 'Comment')
+    UserStats = apps.get_model('posts', 'UserStats')
+    totals = Comment.objects.order_by().values('author_id').annotate(
+        total=models.Count('id')).values_list('author_id', 'total')
+    for author_id, total in totals.iterator():
+        UserStats.objects.filter(user_id=author_id).update(
+            comments_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_comment_index_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='comment_author_pub_date_idx'),
+        ),
+        migrations.RunPython(fill_comments_count, migrations.RunPython.noop),
+    ]
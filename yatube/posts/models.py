@@ -15,6 +15,21 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    # Поля, которые нужны для вывода поста в ленте
+    FEED_FIELDS = (
+        'id', 'text', 'pub_date', 'image', 'image_width', 'image_height',
+        'comments_count', 'author', 'author__username', 'author__first_name',
+        'author__last_name',
+        'group', 'group__title', 'group__slug',
+    )
+
+    def feed(self):
+        """Посты для ленты: автор и группа подтягиваются одним запросом,
+        лишние колонки пользователя и группы не выбираются."""
+        return self.select_related('author', 'group').only(*self.FEED_FIELDS)
+
+
 class Post(CreatedModel):
     text = models.TextField(
         verbose_name='Текст поста',
@@ -40,9 +55,35 @@ class Post(CreatedModel):
         upload_to='posts/',
         blank=True
     )
+    # Размеры картинки после обработки при загрузке
+    image_width = models.PositiveIntegerField(
+        verbose_name='Ширина картинки',
+        null=True,
+        editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        verbose_name='Высота картинки',
+        null=True,
+        editable=False
+    )
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Количество комментариев',
+        default=0,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -66,6 +107,12 @@ class Comment(CreatedModel):
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['post', '-pub_date', '-id'],
+                         name='comment_post_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='comment_author_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -85,6 +132,88 @@ class Follow(models.Model):
 
     class Meta:
         unique_together = ['user', 'author']
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
 
     def __str__(self):
         return self.user, self.author
+
+
+class Timeline(models.Model):
+    """Материализованная лента подписок: запись на каждый пост автора,
+    на которого подписан пользователь."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date']
+        unique_together = ['user', 'post']
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+
+class Recommendation(models.Model):
+    """Кого почитать: авторы, на которых подписаны те, на кого подписан
+    пользователь. Пересчитывается командой build_recommendations."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommendations'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    # Сколько авторов из подписок пользователя подписаны на author
+    score = models.PositiveIntegerField()
+    position = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['position']
+        unique_together = ['user', 'position']
+
+    def __str__(self):
+        return f'{self.user_id}: {self.author_id}'
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые обновляются вместе с постами и
+    подписками, чтобы не считать их при каждом просмотре страницы."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    # Автор перестал быть «горячим», но его посты ещё не разложены
+    # по лентам подписчиков: до этого они подмешиваются при чтении
+    timeline_pending = models.BooleanField(default=False)
+
+    def __str__(self):
+        return str(self.user_id)
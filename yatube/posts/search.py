@@ -0,0 +1,86 @@
+import re
+
+from django.db import connection
+
+# Полнотекстовый индекс постов — виртуальная таблица FTS5 SQLite,
+# rowid в ней равен id поста. На других СУБД индекса нет, и поиск
+# работает через icontains.
+FTS_TABLE = 'posts_post_fts'
+WORD_RE = re.compile(r'\w+')
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def normalize(text):
+    # unicode61 не считает «ё» и «е» одной буквой
+    return text.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def index_post(post):
+    index_posts([post])
+
+
+def index_posts(posts, batch_size=400):
+    """Переиндексирует посты двумя запросами на пачку.
+
+    Не executemany: debug toolbar не умеет записывать такие запросы
+    SQLite и роняет сохранение поста. Пачка ограничена числом
+    параметров запроса в старых SQLite (999).
+    """
+    if not is_available():
+        return
+    posts = list(posts)
+    with connection.cursor() as cursor:
+        for start in range(0, len(posts), batch_size):
+            batch = posts[start:start + batch_size]
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN '
+                f'({", ".join(["%s"] * len(batch))})',
+                [post.id for post in batch])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES '
+                f'{", ".join(["(%s, %s)"] * len(batch))}',
+                [value for post in batch
+                 for value in (post.id, normalize(post.text))])
+
+
+def unindex_post(post_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+
+def match_query(query):
+    """Запрос FTS5: все слова запроса, каждое как префикс. Слова
+    берутся в кавычки, поэтому операторы FTS5 в запросе не работают."""
+    words = WORD_RE.findall(normalize(query))
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search(queryset, query):
+    """Посты queryset, подходящие под запрос, от более релевантных
+    к менее релевантным."""
+    if not is_available():
+        return queryset.filter(text__icontains=query)
+    match = match_query(query)
+    if not match:
+        return queryset.none()
+    table = queryset.model._meta.db_table
+    # Через extra, а не id__in=RawSQL: Django берёт подзапрос
+    # в двойные скобки, и SQLite сравнивает id только с первой строкой
+    return queryset.extra(
+        select={'rank': (
+            f'SELECT rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'AND rowid = {table}.id'
+        )},
+        select_params=[match],
+        where=[
+            f'{table}.id IN (SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s)'
+        ],
+        params=[match],
+    ).order_by('rank', '-pub_date', '-id')
@@ -0,0 +1,167 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core import page_cache
+
+from . import counters, recommendations, search, timeline
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user_id=instance.id)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_comments(instance.post_id, 1)
+        counters.change_user(instance.author_id, 'comments_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.change_comments(instance.post_id, -1)
+    counters.change_user(instance.author_id, 'comments_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user(instance.author_id, 'followers_count', 1)
+        counters.change_user(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'followers_count', -1)
+    counters.change_user(instance.user_id, 'following_count', -1)
+
+
+# Полнотекстовый индекс обновляется и при загрузке фикстур
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.unindex_post(instance.id)
+
+
+# Ленты подписок обновляются после счётчиков: «горячесть» автора
+# определяется по числу его подписчиков
+@receiver(post_save, sender=Post)
+def push_to_timelines(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.push_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def clean_timeline(sender, instance, **kwargs):
+    timeline.remove(instance.user_id, instance.author_id)
+    timeline.cool_down(instance.author_id)
+
+
+# Рекомендации пересчитываются редко, а подписку видно сразу
+@receiver(post_save, sender=Follow)
+def forget_recommendation(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        recommendations.forget(instance.user_id, instance.author_id)
+
+
+# Кэш страниц: сбрасываются только области, где видно изменение
+@receiver(pre_save, sender=Post)
+def invalidate_old_group_page(sender, instance, raw=False, **kwargs):
+    # Пост перенесён в другую группу: со старой страницы он пропадает
+    if raw or instance.pk is None:
+        return
+    old_slug = Group.objects.filter(posts__id=instance.pk).exclude(
+        id=instance.group_id).values_list('slug', flat=True).first()
+    if old_slug:
+        page_cache.invalidate(f'group:{old_slug}')
+
+
+@receiver([post_save, post_delete], sender=Post)
+def invalidate_post_pages(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    scopes = [
+        'index',
+        f'profile:{instance.author.username}',
+        f'post:{instance.id}',
+    ]
+    if instance.group_id:
+        scopes.append(f'group:{instance.group.slug}')
+    page_cache.invalidate(*scopes)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_comment_pages(sender, instance, raw=False, **kwargs):
+    # Область comments — для списков API, где видно число комментариев
+    if not raw:
+        page_cache.invalidate(f'post:{instance.post_id}', 'comments')
+
+
+@receiver([post_save, post_delete], sender=Follow)
+def invalidate_follow_pages(sender, instance, raw=False, **kwargs):
+    # Счётчики подписок видны в профилях обоих пользователей
+    if raw:
+        return
+    usernames = User.objects.filter(
+        id__in=(instance.user_id, instance.author_id)
+    ).values_list('username', flat=True)
+    page_cache.invalidate(
+        *(f'profile:{username}' for username in usernames))
+
+
+# Имя и username автора выводятся в карточках его постов на всех
+# страницах и в рекомендациях у других пользователей
+DISPLAYED_USER_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=User)
+def check_displayed_user_fields(sender, instance, raw=False,
+                                update_fields=None, **kwargs):
+    # Вход пользователя сохраняет только last_login — без запроса
+    instance._displayed_changed = False
+    if raw or instance.pk is None or (
+            update_fields is not None
+            and not set(update_fields) & set(DISPLAYED_USER_FIELDS)):
+        return
+    instance._displayed_changed = not User.objects.filter(
+        pk=instance.pk,
+        **{field: getattr(instance, field)
+           for field in DISPLAYED_USER_FIELDS},
+    ).exists()
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_pages(sender, instance, raw=False, **kwargs):
+    if not raw and getattr(instance, '_displayed_changed', False):
+        page_cache.invalidate(page_cache.ALL_PAGES)
+
+
+@receiver([post_save, post_delete], sender=Group)
+def invalidate_group_pages(sender, instance, raw=False, **kwargs):
+    # Название и адрес группы выводятся на страницах всех её постов
+    if not raw:
+        page_cache.invalidate(page_cache.ALL_PAGES)
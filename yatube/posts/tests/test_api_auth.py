@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+User = get_user_model()
+
+
+@override_settings(API_USER_CACHE_TIMEOUT=60)
+class CachedJWTAuthenticationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def user_queries(self):
+        """Сколько запросов к таблице пользователей сделал запрос к API."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/follow/')
+        self.assertEqual(response.status_code, 200)
+        return sum('FROM "auth_user"' in query['sql'] for query in queries)
+
+    def test_user_is_resolved_from_cache(self):
+        """Пользователь читается из базы только при первом запросе."""
+        self.assertEqual(self.user_queries(), 1)
+        self.assertEqual(self.user_queries(), 0)
+
+    def test_user_changes_reset_cache(self):
+        self.user_queries()
+        user = User.objects.get(id=self.user.id)
+        user.set_password('новый-пароль')
+        user.save()
+        self.assertEqual(self.user_queries(), 1)
+        user.is_active = False
+        user.save()
+        response = self.client.get('/api/v1/follow/')
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(API_USER_CACHE_TIMEOUT=0)
+    def test_cache_is_off_without_shared_cache(self):
+        """Без общего кэша пользователь читается из базы каждый раз."""
+        self.assertEqual(self.user_queries(), 1)
+        self.assertEqual(self.user_queries(), 1)
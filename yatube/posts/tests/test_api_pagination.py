@@ -0,0 +1,102 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from posts.models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.bulk_create([
+            Post(text=f'тестовый текст № {i}', author=cls.author)
+            for i in range(25)
+        ])
+        # У части постов одинаковая дата: курсор различает их по id
+        Post.objects.filter(id__lte=5).update(pub_date=timezone.now())
+        cls.posts = list(
+            Post.objects.order_by('-pub_date', '-id')
+            .values_list('id', flat=True))
+        cls.post = Post.objects.get(id=cls.posts[0])
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=cls.author, text=f'коммент {i}')
+            for i in range(7)
+        ])
+        cls.readers = [
+            User.objects.create_user(username=f'reader{i}') for i in range(3)
+        ]
+        cls.reader = cls.readers[0]
+        Follow.objects.bulk_create([
+            Follow(user=cls.reader, author=author)
+            for author in [cls.author] + cls.readers[1:]
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+        cache.clear()
+
+    def walk(self, url, key='next', **params):
+        """id записей со всех страниц, пройденных по ссылкам key."""
+        seen = []
+        response = self.client.get(url, params).json()
+        while True:
+            seen.extend(item.get('id') for item in response['results'])
+            if not response[key]:
+                return seen, response
+            response = self.client.get(response[key]).json()
+
+    def test_next_links_cover_all_posts(self):
+        """Ссылки next проходят все посты без пропусков и повторов."""
+        seen, last = self.walk('/api/v1/posts/', limit=10)
+        self.assertEqual(seen, self.posts)
+        self.assertNotIn('count', last)
+
+    def test_previous_links_return_newer_pages(self):
+        first = self.client.get('/api/v1/posts/', {'limit': 10}).json()
+        second = self.client.get(first['next']).json()
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(first['previous'])
+
+    def test_deep_page_uses_no_offset_or_count(self):
+        """Страницы читаются по ключу: без OFFSET и COUNT(*)."""
+        first = self.client.get('/api/v1/posts/', {'limit': 10}).json()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(first['next'])
+        sql = ' '.join(query['sql'] for query in queries).upper()
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('COUNT(', sql)
+
+    def test_count_is_opt_in(self):
+        response = self.client.get(
+            '/api/v1/posts/', {'limit': 10, 'count': 1}).json()
+        self.assertEqual(response['count'], len(self.posts))
+
+    def test_comments_and_follows_are_paginated(self):
+        comments, _ = self.walk(
+            f'/api/v1/posts/{self.post.id}/comments/', limit=3)
+        self.assertEqual(comments, list(
+            self.post.comments.order_by('-pub_date', '-id')
+            .values_list('id', flat=True)))
+        response = self.client.get('/api/v1/follow/', {'limit': 1}).json()
+        following = [response['results'][0]['following']]
+        while response['next']:
+            response = self.client.get(response['next']).json()
+            following.append(response['results'][0]['following'])
+        self.assertEqual(following, ['reader2', 'reader1', 'author'])
+
+    def test_invalid_cursor(self):
+        for cursor in ('нет', 'e30', 'eyJrIjpbMV19'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    '/api/v1/posts/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
@@ -0,0 +1,139 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import (APIClient, APIRequestFactory,
+                                 force_authenticate)
+
+from api.serializers import UserSerializer
+from api.views import UserViewSet
+
+from posts.models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class ConstantQueriesMixin:
+    """Проверка, что число запросов списка API не растёт с размером
+    страницы: каждая страница должна стоить одинаково."""
+    page_sizes = (1, 5, 20)
+
+    def count_queries(self, url, limit):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), limit)
+        return len(queries)
+
+    def assertConstantQueries(self, url):
+        counts = [self.count_queries(url, limit) for limit in self.page_sizes]
+        self.assertEqual(
+            len(set(counts)), 1,
+            f'{url}: запросов при размерах страницы {self.page_sizes}: '
+            f'{counts}'
+        )
+
+
+class APIQueryCountTests(ConstantQueriesMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # У каждой записи свой автор: ленивая загрузка автора
+        # дала бы по запросу на запись
+        User.objects.bulk_create([
+            User(username=f'author{i}') for i in range(20)
+        ])
+        cls.authors = list(User.objects.filter(username__startswith='author'))
+        # bulk_create не отправляет сигналов, счётчики создаём сами
+        UserStats.objects.bulk_create([
+            UserStats(user=author) for author in cls.authors
+        ])
+        cls.reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        Post.objects.bulk_create([
+            Post(text='текст', author=author, group=group)
+            for author in cls.authors
+        ])
+        cls.post = Post.objects.first()
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=author, text='коммент')
+            for author in cls.authors
+        ])
+        Follow.objects.bulk_create([
+            Follow(user=cls.reader, author=author) for author in cls.authors
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def test_list_endpoints(self):
+        for url in (
+            '/api/v1/posts/',
+            f'/api/v1/posts/{self.post.id}/comments/',
+            '/api/v1/follow/',
+            '/api/v1/authors/',
+        ):
+            with self.subTest(url=url):
+                self.assertConstantQueries(url)
+
+
+class UserSerializerTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.quiet = User.objects.create_user(username='quiet')
+        cls.prolific = User.objects.create_user(username='prolific')
+        Post.objects.create(text='пост тихого', author=cls.quiet)
+        for i in range(30):
+            Post.objects.create(text=f'пост № {i}', author=cls.prolific)
+        post = Post.objects.first()
+        for i in range(8):
+            Comment.objects.create(
+                post=post, author=cls.prolific, text=f'коммент № {i}')
+
+    def retrieve(self, user):
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, user=self.quiet)
+        view = UserViewSet.as_view({'get': 'retrieve'})
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request, username=user.username)
+        return response.data, len(queries)
+
+    def test_user_record_is_bounded(self):
+        """Запись пользователя: счётчики, последние записи и ссылки;
+        число запросов не зависит от числа его постов."""
+        quiet, quiet_queries = self.retrieve(self.quiet)
+        data, queries = self.retrieve(self.prolific)
+        self.assertEqual(queries, quiet_queries)
+        self.assertEqual(data['posts_count'], 30)
+        self.assertEqual(data['comments_count'], 8)
+        self.assertEqual(len(data['posts']), UserSerializer.LATEST_ITEMS)
+        self.assertEqual(data['posts'][0], 'пост № 29')
+        self.assertEqual(data['comments'][0], 'коммент № 7')
+        self.assertTrue(data['posts_url'].endswith(
+            '/api/v1/users/prolific/posts/'))
+        posts = self.client.get(data['posts_url'], {'limit': 50}).json()
+        self.assertEqual(len(posts['results']), 30)
+        comments = self.client.get(data['comments_url']).json()
+        self.assertEqual(len(comments['results']), 8)
+
+    def test_user_list(self):
+        """В списке авторов последние записи у каждого свои и читаются
+        одним запросом на всю страницу."""
+        client = APIClient()
+        client.force_authenticate(self.quiet)
+        response = client.get('/api/v1/authors/')
+        self.assertEqual(response.status_code, 200)
+        users = {user['username']: user for user in response.json()['results']}
+        self.assertEqual(users['quiet']['posts'], ['пост тихого'])
+        self.assertEqual(users['quiet']['comments'], [])
+        self.assertEqual(
+            users['prolific']['posts'],
+            [f'пост № {i}' for i in range(29, 24, -1)])
+        self.assertEqual(
+            users['prolific']['comments'],
+            [f'коммент № {i}' for i in range(7, 2, -1)])
+        response = client.get('/api/v1/authors/prolific/')
+        self.assertEqual(response.json()['posts_count'], 30)
@@ -0,0 +1,92 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from posts import search
+from posts.models import Follow, Group, Post, Timeline, UserStats
+
+User = get_user_model()
+
+
+class BulkCreateTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(text='пост', author=cls.reader)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def test_bulk_posts(self):
+        """Посты создаются одной вставкой со всеми побочными эффектами
+        обычного создания: счётчики, поиск, ленты подписчиков."""
+        data = [
+            {'text': f'пачка № {i}', 'group': self.group.id}
+            for i in range(10)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                '/api/v1/posts/bulk/', data, format='json')
+        self.assertEqual(response.status_code, 201)
+        inserts = [query for query in queries
+                   if query['sql'].startswith('INSERT INTO "posts_post"')]
+        self.assertEqual(len(inserts), 1)
+        ids = [item['id'] for item in response.json()]
+        self.assertEqual(
+            list(Post.objects.filter(id__in=ids).order_by('id')
+                 .values_list('text', flat=True)),
+            [item['text'] for item in data])
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 10)
+        self.assertEqual(
+            list(search.search(Post.objects.all(), 'пачка № 3')
+                 .values_list('id', flat=True)),
+            [ids[3]])
+        self.assertEqual(
+            Timeline.objects.filter(user=self.reader).count(), 10)
+
+    def test_bulk_rejects_whole_batch(self):
+        """Ошибка в одной записи отменяет всю пачку; ошибки — по
+        порядку записей."""
+        data = [{'text': 'хороший'}, {'text': ''}, {'group': 999}]
+        response = self.client.post(
+            '/api/v1/posts/bulk/', data, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        self.assertEqual(errors[0], {})
+        self.assertIn('text', errors[1])
+        self.assertIn('group', errors[2])
+        self.assertFalse(Post.objects.filter(author=self.author).exists())
+
+    @override_settings(API_BULK_MAX_ITEMS=2)
+    def test_bulk_size_limit(self):
+        response = self.client.post(
+            '/api/v1/posts/bulk/', [{'text': 'пост'}] * 3, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Post.objects.filter(author=self.author).exists())
+
+    def test_bulk_comments(self):
+        response = self.client.post(
+            f'/api/v1/posts/{self.post.id}/comments/bulk/',
+            [{'text': f'коммент № {i}'} for i in range(5)], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [item['post'] for item in response.json()], [self.post.id] * 5)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 5)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).comments_count, 5)
+        missing = self.client.post(
+            '/api/v1/posts/999/comments/bulk/', [{'text': 'коммент'}],
+            format='json')
+        self.assertEqual(missing.status_code, 404)
@@ -0,0 +1,70 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(COMMENTS_PAGE_SIZE=3)
+class CommentsPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='пост', author=cls.author)
+        for number in range(7):
+            user = User.objects.create_user(username=f'user_{number}')
+            Comment.objects.create(
+                post=cls.post, author=user, text=f'комментарий {number}')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_first_page(self):
+        """На странице поста только первые комментарии, новые сверху,
+        с авторами без отдельных запросов."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        response = self.client.get(url)
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['комментарий 6', 'комментарий 5', 'комментарий 4'])
+        self.assertContains(response, 'Показать ещё')
+        cache.clear()
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+    def test_load_more(self):
+        """Кнопка подгружает страницы по порядку до последней."""
+        response = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id}))
+        texts = []
+        cursor = response.context['next_cursor']
+        while cursor:
+            response = self.client.get(
+                reverse('posts:post_comments',
+                        kwargs={'post_id': self.post.id}),
+                {'after': cursor})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotContains(response, '<html')
+            texts += [comment.text for comment in response.context['comments']]
+            cursor = response.context['next_cursor']
+        self.assertEqual(texts, [f'комментарий {number}'
+                                 for number in (3, 2, 1, 0)])
+        self.assertNotContains(response, 'Показать ещё')
+
+    def test_bad_cursor(self):
+        """Испорченный курсор и чужой пост — 404."""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(
+            self.client.get(url, {'after': 'мусор'}).status_code, 404)
+        response = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id}))
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0}),
+            {'after': response.context['next_cursor']})
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,108 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(
+            text='тестовый текст', author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def assertNotModified(self, client, url):
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        with CaptureQueriesContext(connection) as queries:
+            repeat = client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat.content, b'')
+        # Сессия и пользователь, но не данные страницы
+        self.assertFalse(any(
+            'posts_' in query['sql'] for query in queries))
+        return response['ETag']
+
+    def test_pages_answer_not_modified(self):
+        """Страницы с актуальной копией у клиента отвечают 304
+        без запросов к таблицам постов."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertNotModified(self.client, url)
+
+    def test_changes_and_visitor_change_etag(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        etag = self.assertNotModified(self.client, url)
+        guest = Client().get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(guest.status_code, 200)
+        Comment.objects.create(
+            post=self.post, author=self.author, text='комментарий')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_csrf_token_changes_etag(self):
+        """Новый CSRF-токен после входа — новая копия страницы с формой
+        комментария, а не 304 со старым токеном."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        etag = self.client.get(url)['ETag']
+        self.assertIn(settings.CSRF_COOKIE_NAME, self.client.cookies)
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'x' * 64
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_api_lists_answer_not_modified(self):
+        client = APIClient()
+        client.force_authenticate(self.reader)
+        comments = f'/api/v1/posts/{self.post.id}/comments/'
+        for url in ('/api/v1/posts/', comments, '/api/v1/follow/'):
+            with self.subTest(url=url):
+                self.assertNotModified(client, url)
+        etag = client.get('/api/v1/posts/')['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.author, text='комментарий')
+        response = client.get('/api/v1/posts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_last_modified_moves_forward(self):
+        """Last-Modified — время изменения: клиент только с
+        If-Modified-Since после нового поста получает страницу."""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        last_modified = response['Last-Modified']
+        self.assertEqual(self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        later = time.time() + 60
+        with mock.patch('core.page_cache.time.time', return_value=later):
+            Post.objects.create(text='новый пост', author=self.author)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['Last-Modified'], last_modified)
@@ -0,0 +1,96 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(
+            text='тестовый текст', author=cls.author)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def test_counters_follow_changes(self):
+        """Счётчики меняются при создании и удалении записей."""
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text='комментарий')
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.user).following_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.user).comments_count, 1)
+        comment.delete()
+        follow.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 0)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.user).comments_count, 0)
+
+    def test_drifted_zero_counters_are_recounted(self):
+        """Удаление при обнулённом счётчике не падает, а пересчитывает
+        счётчик по базе."""
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text='комментарий')
+        Comment.objects.create(
+            post=self.post, author=self.user, text='ещё комментарий')
+        UserStats.objects.filter(user=self.user).update(comments_count=0)
+        Post.objects.filter(id=self.post.id).update(comments_count=0)
+        comment.delete()
+        self.assertEqual(
+            UserStats.objects.get(user=self.user).comments_count, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_pages_render_without_aggregates(self):
+        """Профиль и страница поста не выполняют COUNT по постам автора."""
+        urls = (
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.authorized_client.get(url)
+                self.assertEqual(response.context['post_count'], 1)
+                self.assertFalse(any(
+                    'COUNT(' in query['sql']
+                    for query in queries.captured_queries
+                ))
+
+    def test_reconcile_counters_command(self):
+        """Команда reconcile_counters исправляет расхождения."""
+        UserStats.objects.filter(user=self.author).update(posts_count=7)
+        Post.objects.filter(id=self.post.id).update(comments_count=3)
+        UserStats.objects.filter(user=self.user).delete()
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1)
+        self.assertTrue(UserStats.objects.filter(user=self.user).exists())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
@@ -0,0 +1,110 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from posts import follows
+from posts.models import Follow, Post, Timeline, UserStats
+
+User = get_user_model()
+
+
+class FollowsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.post = Post.objects.create(text='пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_follow_is_idempotent(self):
+        """Повторная подписка ничего не меняет, а первая обновляет
+        счётчики и ленту, как при обычном сохранении."""
+        self.assertTrue(follows.follow(self.user, self.author))
+        self.assertFalse(follows.follow(self.user, self.author))
+        self.assertEqual(Follow.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+        self.assertTrue(Timeline.objects.filter(
+            user=self.user, post=self.post).exists())
+
+    def test_unfollow_is_idempotent(self):
+        """Повторная отписка ничего не меняет."""
+        follows.follow(self.user, self.author)
+        self.assertTrue(follows.unfollow(self.user, self.author))
+        self.assertFalse(follows.unfollow(self.user, self.author))
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.user).following_count, 0)
+        self.assertFalse(Timeline.objects.filter(user=self.user).exists())
+
+    def test_follow_self(self):
+        """На себя подписаться нельзя."""
+        self.assertFalse(follows.follow(self.user, self.user))
+        self.assertFalse(Follow.objects.exists())
+
+    def test_unfollow_view_without_follow(self):
+        """Отписка без подписки — просто переход в профиль, а не 404."""
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'author'}))
+        self.assertRedirects(response, reverse(
+            'posts:profile', kwargs={'username': 'author'}))
+
+    def test_api_follow_duplicate(self):
+        """API по-прежнему отвечает 400 на повторную подписку."""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post(
+            '/api/v1/follow/', {'following': 'author'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            response.json(), {'user': 'reader', 'following': 'author'})
+        response = client.post(
+            '/api/v1/follow/', {'following': 'author'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {
+            'non_field_errors': ['Вы уже подписаны на данного автора!']})
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+
+    def test_api_bulk(self):
+        """Массовая подписка и отписка с итогом по каждому имени."""
+        follows.follow(self.user, self.other)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/v1/follow/bulk/', {
+            'follow': ['author', 'author', 'reader', 'nobody'],
+            'unfollow': ['other', 'author_2'],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'follow': {
+                'author': 'followed', 'reader': 'self',
+                'nobody': 'not_found',
+            },
+            'unfollow': {'other': 'unfollowed', 'author_2': 'not_found'},
+        })
+        self.assertEqual(
+            list(Follow.objects.filter(user=self.user)
+                 .values_list('author__username', flat=True)),
+            ['author'])
+        self.assertEqual(self.stats(self.user).following_count, 1)
+
+    def test_api_bulk_limit(self):
+        """Слишком длинные списки отклоняются целиком."""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.settings(API_BULK_MAX_ITEMS=2):
+            response = client.post('/api/v1/follow/bulk/', {
+                'follow': ['author', 'other'], 'unfollow': ['other'],
+            }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Follow.objects.exists())
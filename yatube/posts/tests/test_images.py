@@ -0,0 +1,72 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts.images import ingest
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_upload(name, size, image_format, mode='RGB', **save_options):
+    buffer = BytesIO()
+    Image.new(mode, size, 'red').save(buffer, image_format, **save_options)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_MAX_SIDE=400)
+class ImageIngestTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_large_jpeg_downscaled_without_metadata(self):
+        """Большой JPEG уменьшается, а EXIF отбрасывается."""
+        exif = Image.Exif()
+        exif[0x010f] = 'Камера'
+        upload = make_upload(
+            'photo.jpeg', (1600, 1200), 'JPEG', exif=exif.tobytes())
+        image_file, width, height = ingest(upload)
+        self.assertEqual((width, height), (400, 300))
+        self.assertEqual(image_file.name, 'photo.jpg')
+        with Image.open(image_file) as image:
+            self.assertEqual(image.size, (400, 300))
+            self.assertNotIn('exif', image.info)
+
+    def test_format_kept_for_png(self):
+        upload = make_upload('picture.png', (100, 50), 'PNG', mode='RGBA')
+        image_file, width, height = ingest(upload)
+        self.assertEqual(image_file.name, 'picture.png')
+        self.assertEqual((width, height), (100, 50))
+
+    @override_settings(IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels_rejected(self):
+        """Картинки, которые нельзя декодировать в уменьшенном виде,
+        ограничены числом пикселей."""
+        with self.assertRaises(ValidationError):
+            ingest(make_upload('picture.png', (20, 20), 'PNG'))
+
+    def test_post_create_records_image_size(self):
+        """При создании поста записываются размеры обработанной
+        картинки."""
+        user = User.objects.create_user(username='author')
+        client = Client()
+        client.force_login(user)
+        client.post(reverse('posts:post_create'), data={
+            'text': 'пост с фото',
+            'image': make_upload('photo.jpg', (800, 400), 'JPEG'),
+        })
+        post = Post.objects.get(text='пост с фото')
+        self.assertEqual((post.image_width, post.image_height), (400, 200))
+        self.assertEqual(post.image.name, 'posts/photo.jpg')
@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+
+User = get_user_model()
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        # 25 постов: три страницы по 10, 10 и 5 постов
+        Post.objects.bulk_create([
+            Post(text=f'тестовый текст № {i}', author=cls.author)
+            for i in range(25)
+        ])
+        cls.posts = list(Post.objects.order_by('-pub_date', '-id'))
+        cls.url = reverse('posts:profile',
+                          kwargs={'username': cls.author.username})
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_pages_follow_cursors(self):
+        """Курсоры «старее» проходят ленту без пропусков и повторов."""
+        seen = []
+        page_obj = self.client.get(self.url).context['page_obj']
+        seen.extend(page_obj)
+        while page_obj.has_next():
+            page_obj = self.client.get(
+                self.url, {'after': page_obj.next_cursor}
+            ).context['page_obj']
+            seen.extend(page_obj)
+        self.assertEqual(seen, self.posts)
+
+    def test_previous_cursor_returns_newer_page(self):
+        """Курсор «новее» возвращает предыдущую страницу."""
+        first = self.client.get(self.url).context['page_obj']
+        second = self.client.get(
+            self.url, {'after': first.next_cursor}).context['page_obj']
+        back = self.client.get(
+            self.url, {'before': second.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный курсор не ломает страницу."""
+        page_obj = self.client.get(
+            self.url, {'after': 'испорчен'}).context['page_obj']
+        self.assertEqual(list(page_obj), self.posts[:10])
+
+    def test_no_count_query(self):
+        """Постраничный вывод не считает общее количество постов."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'), {'page': 3})
+        self.assertEqual(len(response.context['page_obj']), 5)
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] for query in queries.captured_queries
+        ))
@@ -0,0 +1,93 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class FeedQueryBudgetTests(TestCase):
+    """Количество SQL-запросов ленты не зависит от числа постов."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.group = Group.objects.create(
+            title='тестовый заголовок',
+            slug='test-slug',
+            description='тестовое описание'
+        )
+        self.author = User.objects.create_user(username='author')
+        Follow.objects.create(user=self.user, author=self.author)
+
+    def add_posts(self, count):
+        """Каждый пост — от своего автора и в своей группе, чтобы
+        обращения к связанным объектам были заметны."""
+        for _ in range(count):
+            number = Post.objects.count()
+            author = User.objects.create_user(
+                username=f'author_{number}', first_name='Имя')
+            group = Group.objects.create(
+                title=f'группа {number}',
+                slug=f'group-{number}',
+                description='описание'
+            )
+            Follow.objects.create(user=self.user, author=author)
+            Post.objects.create(text='текст', author=author, group=group)
+            Post.objects.create(text='текст', author=self.author,
+                                group=self.group)
+
+    def assert_budget(self, url, budget):
+        self.add_posts(1)
+        cache.clear()
+        with self.assertNumQueries(budget):
+            self.authorized_client.get(url)
+        self.add_posts(9)
+        cache.clear()
+        with self.assertNumQueries(budget):
+            response = self.authorized_client.get(url)
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_index_budget(self):
+        self.assert_budget(reverse('posts:index'), 3)
+
+    def test_group_list_budget(self):
+        self.assert_budget(reverse(
+            'posts:group_list', kwargs={'slug': self.group.slug}), 4)
+
+    def test_profile_budget(self):
+        self.assert_budget(reverse(
+            'posts:profile', kwargs={'username': self.author.username}), 6)
+
+    def test_follow_index_budget(self):
+        self.assert_budget(reverse('posts:follow_index'), 4)
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='тестовый заголовок',
+            slug='test-slug',
+            description='тестовое описание'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for _ in range(15):
+            Post.objects.create(
+                text='текст', author=cls.author, group=cls.group)
+
+    def test_query_plans_use_indexes(self):
+        """Запросы лент и API не просматривают таблицы целиком
+        и не сортируют результат во временном B-дереве."""
+        out = StringIO()
+        call_command('check_query_plans', stdout=out, stderr=out)
+        self.assertIn('Все планы запросов в порядке', out.getvalue())
@@ -0,0 +1,105 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import ratelimit
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+LIMITS = {
+    'api': {'ip': (2, 60)},
+    'comment': {'user': (3, 60)},
+}
+
+
+@override_settings(RATE_LIMITS=LIMITS)
+class RateLimitTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.other = User.objects.create_user(username='other')
+        cls.post = Post.objects.create(text='текст', author=cls.other)
+        cls.url = reverse('posts:add_comment', kwargs={'post_id': cls.post.id})
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def comment(self, client):
+        return client.post(self.url, {'text': 'комментарий'})
+
+    def test_comments_over_limit_are_rejected(self):
+        """Сверх лимита комментарий не создаётся, ответ 429 с
+        Retry-After; лимит у каждого пользователя свой."""
+        for _ in range(3):
+            self.assertEqual(self.comment(self.client).status_code, 302)
+        response = self.comment(self.client)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(Comment.objects.count(), 3)
+        other = Client()
+        other.force_login(self.other)
+        self.assertEqual(self.comment(other).status_code, 302)
+
+    def test_bucket_refills_over_time(self):
+        now = 1000.0
+        with mock.patch('core.ratelimit.time.time', lambda: now):
+            for _ in range(3):
+                self.comment(self.client)
+            self.assertEqual(self.comment(self.client).status_code, 429)
+            # За 20 секунд корзина на 3 запроса в минуту копит один токен
+            now += 20
+            self.assertEqual(self.comment(self.client).status_code, 302)
+            self.assertEqual(self.comment(self.client).status_code, 429)
+
+    def test_idle_time_does_not_add_tokens(self):
+        """После долгого простоя проходит ровно полная корзина, а не
+        вдвое больше."""
+        now = 1000.0
+        with mock.patch('core.ratelimit.time.time', lambda: now):
+            self.comment(self.client)
+            # Простой короче срока записи в кэше
+            now += 50
+            for _ in range(3):
+                self.assertEqual(self.comment(self.client).status_code, 302)
+            self.assertEqual(self.comment(self.client).status_code, 429)
+
+    def test_allowed_request_costs_one_cache_call(self):
+        self.comment(self.client)
+        with mock.patch('core.ratelimit.cache', wraps=cache) as spy:
+            self.comment(self.client)
+        self.assertEqual(len(spy.method_calls), 1)
+
+    def test_api_guests_are_limited_by_ip(self):
+        client = APIClient()
+        for _ in range(2):
+            self.assertEqual(client.get('/api/v1/posts/').status_code, 200)
+        response = client.get('/api/v1/posts/')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertIsNone(
+            ratelimit.hit(
+                mock.Mock(META={'REMOTE_ADDR': '10.0.0.1'}, user=None),
+                'api'))
+
+    @override_settings(RATELIMIT_IP_HEADER='HTTP_X_FORWARDED_FOR')
+    def test_guests_behind_proxy_are_limited_separately(self):
+        """За прокси гости различаются по последнему адресу в
+        X-Forwarded-For, подделанный клиентом адрес не учитывается."""
+        client = APIClient(REMOTE_ADDR='10.0.0.1')
+        for _ in range(2):
+            client.get(
+                '/api/v1/posts/', HTTP_X_FORWARDED_FOR='1.1.1.1, 2.2.2.2')
+        response = client.get(
+            '/api/v1/posts/', HTTP_X_FORWARDED_FOR='3.3.3.3, 2.2.2.2')
+        self.assertEqual(response.status_code, 429)
+        response = client.get(
+            '/api/v1/posts/', HTTP_X_FORWARDED_FOR='4.4.4.4')
+        self.assertEqual(response.status_code, 200)
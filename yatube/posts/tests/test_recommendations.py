@@ -0,0 +1,119 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from posts import recommendations
+from posts.models import Follow, Recommendation
+
+User = get_user_model()
+
+
+class RecommendationsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        users = {
+            name: User.objects.create_user(username=name)
+            for name in ('reader', 'friend_1', 'friend_2', 'popular',
+                         'niche', 'followed', 'loner')
+        }
+        cls.users = users
+        # reader → friend_1, friend_2, followed
+        # friend_1, friend_2 → popular; friend_1 → niche, followed
+        for user, author in (
+                ('reader', 'friend_1'), ('reader', 'friend_2'),
+                ('reader', 'followed'), ('friend_1', 'popular'),
+                ('friend_2', 'popular'), ('friend_1', 'niche'),
+                ('friend_1', 'followed'), ('friend_1', 'reader')):
+            Follow.objects.create(user=users[user], author=users[author])
+
+    def setUp(self):
+        cache.clear()
+
+    def suggested(self, name):
+        return [
+            (item.author.username, item.score)
+            for item in recommendations.for_user(self.users[name], 10)
+        ]
+
+    def test_build(self):
+        """Авторы упорядочены по числу общих подписок; сам пользователь
+        и те, на кого он уже подписан, не рекомендуются."""
+        call_command('build_recommendations', stdout=StringIO())
+        self.assertEqual(
+            self.suggested('reader'), [('popular', 2), ('niche', 1)])
+        self.assertEqual(self.suggested('loner'), [])
+
+    def test_follows_of_new_users_are_skipped(self):
+        """Подписки пользователя, появившегося между чтением
+        пользователей и подписок, не ломают построение графа."""
+        graph = recommendations.FollowGraph.from_pairs(
+            [1, 2, 3], [(1, 2), (1, 4), (2, 3), (4, 1), (5, 6)])
+        self.assertEqual(list(graph.following(0)), [1])
+        self.assertEqual(list(graph.following(1)), [2])
+        self.assertEqual(list(graph.following(2)), [])
+        self.assertEqual(list(graph.followers), [0, 1, 1])
+
+    def test_rebuild_replaces_rows(self):
+        """Повторный запуск заменяет старые рекомендации."""
+        recommendations_count = len(self.users)
+        call_command('build_recommendations', stdout=StringIO())
+        Follow.objects.filter(author=self.users['niche']).delete()
+        call_command(
+            'build_recommendations', count=recommendations_count,
+            batch_size=2, stdout=StringIO())
+        self.assertEqual(self.suggested('reader'), [('popular', 2)])
+
+    def test_follow_removes_recommendation(self):
+        """Подписка сразу убирает автора из рекомендаций."""
+        call_command('build_recommendations', stdout=StringIO())
+        Follow.objects.create(
+            user=self.users['reader'], author=self.users['popular'])
+        self.assertEqual(self.suggested('reader'), [('niche', 1)])
+
+    def test_sidebar_changes_etag(self):
+        """Пересчёт рекомендаций и подписка на рекомендованного автора
+        меняют ETag чужих профилей, где видна боковая панель."""
+        client = Client()
+        client.force_login(self.users['reader'])
+        url = reverse('posts:profile', kwargs={'username': 'loner'})
+        etag = client.get(url)['ETag']
+        call_command('build_recommendations', stdout=StringIO())
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'popular')
+        etag = response['ETag']
+        Follow.objects.create(
+            user=self.users['reader'], author=self.users['popular'])
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'popular')
+
+    def test_sidebar_and_api(self):
+        """Рекомендации посетителя видны в профиле и в API."""
+        call_command('build_recommendations', stdout=StringIO())
+        client = Client()
+        client.force_login(self.users['reader'])
+        response = client.get(
+            reverse('posts:profile', kwargs={'username': 'loner'}))
+        self.assertContains(response, 'Общих подписок', 2)
+        self.assertContains(
+            response, reverse('posts:profile', kwargs={'username': 'niche'}))
+        response = Client().get(
+            reverse('posts:profile', kwargs={'username': 'loner'}))
+        self.assertNotContains(response, 'Общих подписок')
+
+        api = APIClient()
+        api.force_authenticate(self.users['reader'])
+        with self.assertNumQueries(1):
+            response = api.get('/api/v1/recommendations/')
+        self.assertEqual(response.json(), [
+            {'author': 'popular', 'score': 2},
+            {'author': 'niche', 'score': 1},
+        ])
+        self.assertEqual(Recommendation.objects.count(), 3)
@@ -0,0 +1,75 @@
+import debug_toolbar
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import include, path, reverse
+from rest_framework.test import APIClient
+
+from posts import search
+from posts.models import Post
+from yatube import urls
+
+User = get_user_model()
+
+# Адреса панели подключаются только при DEBUG на момент импорта urls
+urlpatterns = urls.urlpatterns + [
+    path('__debug__/', include(debug_toolbar.urls)),
+]
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.rare = Post.objects.create(
+            text='Ёжик в тумане', author=cls.author)
+        cls.frequent = Post.objects.create(
+            text='ежик ежик ежик и туманность', author=cls.author)
+        cls.other = Post.objects.create(
+            text='совсем о другом', author=cls.author)
+
+    def test_search_ranks_matches(self):
+        """Находятся посты со всеми словами запроса, более релевантные
+        раньше; «ё» и «е» не различаются, слова ищутся по префиксу."""
+        self.assertEqual(
+            list(search.search(Post.objects.all(), 'ёжик')),
+            [self.frequent, self.rare])
+        self.assertEqual(
+            list(search.search(Post.objects.all(), 'ежик туман')),
+            [self.frequent, self.rare])
+        self.assertFalse(search.search(Post.objects.all(), '"*'))
+
+    def test_index_follows_saves_and_deletes(self):
+        post = Post.objects.create(text='кактус', author=self.author)
+        self.assertEqual(
+            list(search.search(Post.objects.all(), 'кактус')), [post])
+        post.text = 'фикус'
+        post.save()
+        self.assertFalse(search.search(Post.objects.all(), 'кактус'))
+        post.delete()
+        self.assertFalse(search.search(Post.objects.all(), 'фикус'))
+
+    def test_search_page(self):
+        response = Client().get(reverse('posts:search'), {'q': 'другом'})
+        self.assertEqual(list(response.context['page_obj']), [self.other])
+
+    def test_api_search(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        response = client.get('/api/v1/posts/', {'search': 'ежик'})
+        self.assertEqual(
+            [post['id'] for post in response.json()['results']],
+            [self.frequent.id, self.rare.id])
+
+    @override_settings(DEBUG=True, ROOT_URLCONF=__name__)
+    def test_posts_are_saved_under_debug_toolbar(self):
+        """Панель SQL debug toolbar записывает каждый запрос; индекс
+        обновляется запросами, которые она умеет записать."""
+        client = Client()
+        client.force_login(self.author)
+        response = client.post(
+            reverse('posts:post_create'), {'text': 'пост из отладки'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            list(search.search(Post.objects.all(), 'отладки')),
+            [Post.objects.get(text='пост из отладки')])
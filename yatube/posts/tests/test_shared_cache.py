@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from core.cache import SQLiteCache
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_values_shared_between_instances(self):
+        """Значения видны другому экземпляру с тем же файлом, как
+        другому процессу."""
+        self.cache.set('page', {'text': 'страница'})
+        self.assertEqual(self.make_cache().get('page'), {'text': 'страница'})
+        self.assertTrue(self.make_cache().add('new', 1))
+        self.assertFalse(self.cache.add('new', 2))
+        self.make_cache().delete('page')
+        self.assertIsNone(self.cache.get('page'))
+
+    def test_incr(self):
+        """incr меняет число на месте и не находит отсутствующий ключ."""
+        self.cache.set('counter', 1)
+        other = self.make_cache()
+        self.assertEqual(other.incr('counter'), 2)
+        self.assertEqual(self.cache.incr('counter', 10), 12)
+        self.assertEqual(self.cache.decr('counter'), 11)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_expired_values_not_returned(self):
+        self.cache.set('short', 'значение', 0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertTrue(self.cache.add('short', 'новое'))
+
+    def test_least_recently_used_evicted(self):
+        """При превышении MAX_ENTRIES удаляются давно не читавшиеся
+        записи."""
+        cache = self.make_cache(MAX_ENTRIES=3, CULL_FREQUENCY=3)
+        for number in range(3):
+            cache.set(f'key:{number}', number)
+            time.sleep(0.01)
+        # Делаем key:0 самым свежим
+        cache._connection.execute(
+            'UPDATE cache_entries SET accessed = ? WHERE key = ?',
+            (time.time(), cache.make_key('key:0')))
+        cache.set('key:3', 3)
+        self.assertEqual(cache.get('key:0'), 0)
+        self.assertIsNone(cache.get('key:1'))
+        self.assertEqual(cache.get('key:3'), 3)
+
+    def test_max_size_enforced(self):
+        """Суммарный размер значений не превышает MAX_SIZE."""
+        cache = self.make_cache(MAX_SIZE=10000)
+        for number in range(10):
+            cache.set(f'key:{number}', 'x' * 3000)
+        entries, size = cache._connection.execute(
+            'SELECT entries, bytes FROM cache_totals').fetchone()
+        self.assertLessEqual(size, 10000)
+        self.assertEqual(
+            entries, len(cache.get_many(
+                [f'key:{number}' for number in range(10)])))
+        self.assertIsNotNone(cache.get('key:9'))
+
+    def test_oversized_value_not_stored(self):
+        """Значение больше MAX_SIZE не сохраняется и не вытесняет
+        остальные записи."""
+        cache = self.make_cache(MAX_SIZE=10000)
+        cache.set('small', 'x' * 100)
+        cache.set('huge', 'старое')
+        cache.set('huge', 'x' * 20000)
+        self.assertFalse(cache.add('other', 'x' * 20000))
+        self.assertIsNone(cache.get('huge'))
+        self.assertIsNone(cache.get('other'))
+        self.assertEqual(cache.get('small'), 'x' * 100)
+
+    def test_get_many_is_one_query(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 'два')
+        self.cache.set('old', 3, 0.01)
+        time.sleep(0.02)
+        statements = []
+        self.cache._connection.set_trace_callback(statements.append)
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'old', 'missing']),
+            {'a': 1, 'b': 'два'})
+        self.assertEqual(len(statements), 1)
@@ -0,0 +1,74 @@
+import gzip
+import json
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.views import PostViewSet, accepts_gzip
+from posts.models import Post
+
+User = get_user_model()
+
+
+class StreamingListTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.bulk_create([
+            Post(text=f'тестовый текст № {i}', author=cls.author)
+            for i in range(12)
+        ])
+        cls.posts = list(
+            Post.objects.order_by('-pub_date', '-id')
+            .values_list('id', flat=True))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        # Маленькие пачки, чтобы поток состоял из нескольких частей
+        patcher = mock.patch.object(PostViewSet, 'stream_chunk_size', 5)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_stream_returns_whole_list(self):
+        """Поток отдаёт весь список в порядке ленты, без пагинации."""
+        response = self.client.get('/api/v1/posts/', {'stream': 1})
+        self.assertTrue(response.streaming)
+        self.assertNotIn('Content-Encoding', response)
+        body = b''.join(response.streaming_content)
+        self.assertEqual(
+            [post['id'] for post in json.loads(body)], self.posts)
+
+    def test_stream_is_compressed_for_gzip_clients(self):
+        response = self.client.get(
+            '/api/v1/posts/', {'stream': 1}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        body = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(
+            [post['id'] for post in json.loads(body)], self.posts)
+
+    def test_accepts_gzip_respects_q_values(self):
+        """gzip с q=0 — отказ от сжатия, «*» разрешает gzip."""
+        cases = {
+            '': False,
+            'gzip': True,
+            'deflate, gzip;q=0.5': True,
+            'gzip;q=0': False,
+            'gzip; q=0.0, *': False,
+            '*;q=0.1': True,
+            'identity, *;q=0': False,
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                self.assertIs(accepts_gzip(header), expected)
+        response = self.client.get(
+            '/api/v1/posts/', {'stream': 1}, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_empty_stream(self):
+        response = self.client.get(
+            '/api/v1/follow/', {'stream': 1})
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), [])
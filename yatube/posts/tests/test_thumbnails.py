@@ -0,0 +1,241 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+
+from posts import thumbnails
+from posts.management.commands.backfill_thumbnails import sizes_signature
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='picture.png', size=(40, 30)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'blue').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+
+    def thumbnails_in_store(self, post):
+        """Сколько превью поста уже записано в хранилище ключей sorl."""
+        thumbnail_keys = default.kvstore._get(
+            ImageFile(post.image).key, identity='thumbnails')
+        return len(thumbnail_keys or ())
+
+    @override_settings(THUMBNAIL_INLINE=True)
+    @mock.patch('posts.thumbnails.transaction.on_commit', lambda func: func())
+    def test_post_create_generates_thumbnails(self):
+        """После создания поста превью всех размеров уже готовы."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'пост с картинкой', 'image': make_image()},
+        )
+        post = Post.objects.get(text='пост с картинкой')
+        self.assertEqual(self.thumbnails_in_store(post),
+                         len(thumbnails.SIZES))
+
+    def test_submit_uses_pool(self):
+        """Превью создаются в потоке пула, который закрывает своё
+        соединение с базой."""
+        with mock.patch.object(thumbnails.get_executor(), 'submit') as submit:
+            thumbnails._submit(1)
+        submit.assert_called_once_with(thumbnails._generate_in_thread, 1)
+        with mock.patch.object(thumbnails, 'generate_for_post') as task, \
+                mock.patch.object(thumbnails.connection, 'close') as close:
+            thumbnails._generate_in_thread(1)
+        task.assert_called_once_with(1)
+        close.assert_called_once_with()
+
+    @override_settings(THUMBNAIL_INLINE=True)
+    def test_submit_inline(self):
+        """С THUMBNAIL_INLINE превью создаются сразу, без пула."""
+        executor = thumbnails.get_executor()
+        with mock.patch.object(executor, 'submit') as submit, \
+                mock.patch.object(thumbnails, 'generate_for_post') as task:
+            thumbnails._submit(1)
+        submit.assert_not_called()
+        task.assert_called_once_with(1)
+
+    def test_worker_skips_missing_post(self):
+        """Задача для удалённого поста завершается без ошибки."""
+        thumbnails.generate_for_post(0)
+
+    def test_thumbnail_name_matches_sorl(self):
+        """thumbnail_name повторяет расчёт имени внутри sorl: если
+        после обновления sorl имена разойдутся, prefetch перестанет
+        находить превью."""
+        post = Post.objects.create(
+            text='пост', author=self.author, image=make_image('name.png'))
+        sizes = dict(thumbnails.SIZES, plain=('50x50', {}),
+                     jpeg=('100', {'format': 'JPEG', 'quality': 70}))
+        for preserve in (False, True):
+            with self.settings(THUMBNAIL_PRESERVE_FORMAT=preserve):
+                for size, (geometry, options) in sizes.items():
+                    with self.subTest(size=size, preserve=preserve):
+                        self.assertEqual(
+                            thumbnails.thumbnail_name(
+                                post.image, geometry, options),
+                            get_thumbnail(
+                                post.image, geometry, **options).name)
+
+    def test_prefetch_finds_page_thumbnails_at_once(self):
+        """Превью всей страницы находятся одним запросом к базе."""
+        posts = [
+            Post.objects.create(
+                text=f'пост {number}', author=self.author,
+                image=make_image(f'picture_{number}.png'))
+            for number in range(3)
+        ]
+        for post in posts:
+            thumbnails.generate(post.image)
+        posts.append(
+            Post.objects.create(text='без картинки', author=self.author))
+        cache.clear()
+        with self.assertNumQueries(1):
+            thumbnails.prefetch(posts)
+        geometry, options = thumbnails.SIZES['card']
+        for post in posts[:3]:
+            self.assertEqual(
+                post.thumbnails['card'].url,
+                get_thumbnail(post.image, geometry, **options).url)
+        # Второй раз записи берутся из кэша
+        with self.assertNumQueries(0):
+            thumbnails.prefetch(posts)
+
+    def test_feed_uses_prefetched_thumbnails(self):
+        """Лента выводит найденные заранее превью."""
+        post = Post.objects.create(
+            text='пост', author=self.author, image=make_image())
+        thumbnails.generate(post.image)
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertIn('card', response.context['page_obj'][0].thumbnails)
+
+    def test_backfill_command_resumes_from_checkpoint(self):
+        """Команда создаёт превью, продолжает с сохранённого места и
+        после завершения удаляет прогресс."""
+        posts = [
+            Post.objects.create(
+                text=f'пост {number}', author=self.author,
+                image=make_image(f'backfill_{number}.png'))
+            for number in range(3)
+        ]
+        checkpoint = os.path.join(TEMP_MEDIA_ROOT, 'checkpoint')
+        with open(checkpoint, 'w') as file:
+            file.write(f'{sizes_signature()}:{posts[0].id}')
+        out = StringIO()
+        call_command('backfill_thumbnails', processes=1, batch_size=1,
+                     checkpoint=checkpoint, stdout=out)
+        self.assertEqual(self.thumbnails_in_store(posts[0]), 0)
+        for post in posts[1:]:
+            self.assertEqual(self.thumbnails_in_store(post),
+                             len(thumbnails.SIZES))
+        self.assertIn('2/2 картинок', out.getvalue())
+        self.assertFalse(os.path.exists(checkpoint))
+
+    def test_backfill_command_ignores_checkpoint_of_other_sizes(self):
+        """Прогресс, сохранённый для другого набора размеров, не
+        пропускает посты."""
+        post = Post.objects.create(
+            text='пост', author=self.author, image=make_image('sizes.png'))
+        checkpoint = os.path.join(TEMP_MEDIA_ROOT, 'checkpoint_sizes')
+        with open(checkpoint, 'w') as file:
+            file.write(f'{"0" * 32}:{post.id}')
+        out = StringIO()
+        call_command('backfill_thumbnails', processes=1,
+                     checkpoint=checkpoint, stdout=out)
+        self.assertEqual(
+            self.thumbnails_in_store(post), len(thumbnails.SIZES))
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=TEMP_MEDIA_ROOT))
+    def test_collect_media_garbage(self):
+        """Команда удаляет картинки без постов, их превью и лишние
+        файлы превью, а в режиме dry-run ничего не трогает."""
+        cache.clear()
+        kept = Post.objects.create(
+            text='остаётся', author=self.author, image=make_image('kept.png'))
+        removed = Post.objects.create(
+            text='удаляется', author=self.author,
+            image=make_image('removed.png'))
+        for post in (kept, removed):
+            thumbnails.generate(post.image)
+        geometry, options = thumbnails.SIZES['card']
+        kept_thumbnail = get_thumbnail(kept.image, geometry, **options).name
+        removed_thumbnail = get_thumbnail(
+            removed.image, geometry, **options).name
+        removed_image = removed.image.name
+        removed.delete()
+        stray = default_storage.save(
+            'cache/00/00/stray.jpg', ContentFile(b'x'))
+
+        out = StringIO()
+        call_command('collect_media_garbage', dry_run=True, min_age=0,
+                     stdout=out)
+        self.assertIn('Будет удалено файлов: 3', out.getvalue())
+        self.assertTrue(default_storage.exists(removed_image))
+
+        call_command('collect_media_garbage', min_age=0, stdout=StringIO())
+        for name in (removed_image, removed_thumbnail, stray):
+            self.assertFalse(default_storage.exists(name))
+        self.assertTrue(default_storage.exists(kept.image.name))
+        self.assertTrue(default_storage.exists(kept_thumbnail))
+        self.assertEqual(self.thumbnails_in_store(kept), 1)
+        self.assertIsNone(default.kvstore._get(
+            ImageFile(removed_image).key, identity='thumbnails'))
+
+    def test_kvstore_private_api_used_by_garbage_collector(self):
+        """collect_media_garbage читает и удаляет записи sorl закрытыми
+        методами хранилища ключей: после обновления sorl этот тест
+        покажет, если их поведение изменилось."""
+        cache.clear()
+        post = Post.objects.create(
+            text='пост', author=self.author, image=make_image('kv.png'))
+        geometry, options = thumbnails.SIZES['card']
+        thumbnail = get_thumbnail(post.image, geometry, **options)
+        kvstore = default.kvstore
+        key = ImageFile(post.image).key
+        self.assertIn(key, kvstore._find_keys(identity='thumbnails'))
+        self.assertEqual(kvstore._get(key).name, post.image.name)
+        thumbnail_keys = kvstore._get(key, identity='thumbnails')
+        self.assertEqual(
+            [kvstore._get(thumbnail_key).name
+             for thumbnail_key in thumbnail_keys],
+            [thumbnail.name])
+        kvstore._delete_raw(
+            add_prefix(key), add_prefix(key, 'thumbnails'),
+            *(add_prefix(thumbnail_key) for thumbnail_key in thumbnail_keys))
+        self.assertIsNone(kvstore._get(key))
+        self.assertIsNone(kvstore._get(key, identity='thumbnails'))
+        self.assertIsNone(kvstore._get(thumbnail_keys[0]))
@@ -0,0 +1,117 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.paginator import KeysetPaginator
+from posts.models import Follow, Post, Timeline, UserStats
+from posts import timeline
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.old_post = Post.objects.create(
+            text='старый пост',
+            author=cls.author
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_follow_backfills_timeline(self):
+        """При подписке в ленту попадают уже написанные посты автора."""
+        self.authorized_client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author.username}))
+        self.assertTrue(Timeline.objects.filter(
+            user=self.user, post=self.old_post).exists())
+
+    def test_new_post_pushed_to_followers(self):
+        """Новый пост раскладывается по лентам подписчиков."""
+        Follow.objects.create(user=self.user, author=self.author)
+        new_post = Post.objects.create(text='новый пост', author=self.author)
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], new_post)
+        self.assertEqual(len(response.context['page_obj']), 2)
+
+    def test_unfollow_clears_timeline(self):
+        """При отписке посты автора убираются из ленты."""
+        Follow.objects.create(user=self.user, author=self.author)
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}))
+        self.assertFalse(Timeline.objects.filter(user=self.user).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_hot_author_merged_on_read(self):
+        """Посты «горячего» автора не раскладываются, а подмешиваются
+        в ленту при чтении."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        new_post = Post.objects.create(text='новый пост', author=self.author)
+        self.assertFalse(Timeline.objects.filter(post=new_post).exists())
+        page_obj = KeysetPaginator(timeline.get_feed(self.user), 10).get_page()
+        self.assertEqual(list(page_obj), [new_post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_far_above_limit_backfilled(self):
+        """Автор, у которого подписчиков стало меньше предела не ровно
+        на нём (предел подняли), тоже отмечается для раскладки, а
+        автор, которого всегда рассылали, — нет."""
+        followers = [
+            User.objects.create_user(username=f'follower{number}')
+            for number in range(3)
+        ]
+        for follower in [self.user] + followers:
+            Follow.objects.create(user=follower, author=self.author)
+        new_post = Post.objects.create(text='новый пост', author=self.author)
+        with self.settings(TIMELINE_FANOUT_LIMIT=10):
+            Follow.objects.filter(user=followers[0]).delete()
+            self.assertTrue(UserStats.objects.get(
+                user=self.author).timeline_pending)
+            call_command('fan_out_timelines', batch_size=2, stdout=StringIO())
+            self.assertTrue(Timeline.objects.filter(
+                user=followers[2], post=new_post).exists())
+            Follow.objects.filter(user=followers[1]).delete()
+        self.assertFalse(UserStats.objects.get(
+            user=self.author).timeline_pending)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_cooled_down_author_backfilled(self):
+        """Когда автор перестаёт быть «горячим», отписка только отмечает
+        его, а посты по лентам оставшихся подписчиков раскладывает
+        команда. До этого они подмешиваются при чтении."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        new_post = Post.objects.create(text='новый пост', author=self.author)
+        Follow.objects.filter(user=other).delete()
+        self.assertFalse(Timeline.objects.filter(post=new_post).exists())
+        self.assertTrue(UserStats.objects.get(
+            user=self.author).timeline_pending)
+        page_obj = KeysetPaginator(timeline.get_feed(self.user), 10).get_page()
+        self.assertEqual(list(page_obj), [new_post, self.old_post])
+        # Пока автор ждёт раскладки, новые посты тоже не раскладываются
+        later_post = Post.objects.create(text='ещё пост', author=self.author)
+        self.assertFalse(Timeline.objects.filter(post=later_post).exists())
+
+        call_command('fan_out_timelines', batch_size=1, stdout=StringIO())
+        self.assertEqual(
+            set(Timeline.objects.filter(user=self.user).values_list(
+                'post_id', flat=True)),
+            {self.old_post.id, new_post.id, later_post.id})
+        self.assertFalse(UserStats.objects.get(
+            user=self.author).timeline_pending)
+        page_obj = KeysetPaginator(timeline.get_feed(self.user), 10).get_page()
+        self.assertEqual(
+            list(page_obj), [later_post, new_post, self.old_post])
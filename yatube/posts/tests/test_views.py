@@ -6,10 +6,11 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from django import forms
 from django.core.cache import cache
 
-from posts.models import Post, Group, Comment
+from posts.models import Post, Group, Comment, Follow
 
 User = get_user_model()
 
@@ -361,14 +362,96 @@ class PostsViewsCacheTests(TestCase):
         self.authorized_client_author.force_login(self.author)
 
     def test_caсhes_for_index(self):
-        """Проверяем, работу кэша на главной странице."""
+        """Проверяем, работу кэша на главной странице: без изменений
+        через модели страница берётся из кэша, удаление поста сразу
+        сбрасывает кэш."""
         first_response = self.authorized_client_author.get(
             reverse('posts:index')).content
-        self.post.delete()
+        Post.objects.filter(id=self.post.id).update(text='изменённый текст')
         second_response = self.authorized_client_author.get(
             reverse('posts:index')).content
         self.assertEqual(first_response, second_response)
-        cache.clear()
+        Post.objects.get(id=self.post.id).delete()
         new_response = self.authorized_client_author.get(
             reverse('posts:index')).content
         self.assertNotEqual(first_response, new_response)
+
+    def test_shared_cache_keeps_personal_fragments(self):
+        """Кэшированная главная страница одна на всех, а шапка у каждого
+        посетителя своя."""
+        reader = User.objects.create_user(username='reader')
+        reader_client = Client()
+        reader_client.force_login(reader)
+        post = Post.objects.create(text='общий текст', author=self.author)
+        author_response = self.authorized_client_author.get(
+            reverse('posts:index'))
+        # Запрос к базе в обход сигналов кэш не сбрасывает
+        Post.objects.filter(id=post.id).update(text='другой текст')
+        reader_response = reader_client.get(reverse('posts:index'))
+        self.assertContains(author_response, 'Пользователь: author')
+        self.assertContains(reader_response, 'общий текст')
+        self.assertContains(reader_response, 'Пользователь: reader')
+        self.assertNotContains(reader_response, 'Пользователь: author')
+        self.assertNotContains(reader_response, '<!--hole:')
+
+    def test_changes_invalidate_affected_pages(self):
+        """Изменения сбрасывают кэш только тех страниц, где они видны."""
+        group = Group.objects.create(
+            title='группа', slug='cache-group', description='описание')
+        post = Post.objects.create(
+            text='пост в группе', author=self.author, group=group)
+        reader = User.objects.create_user(username='reader')
+        urls = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_list', kwargs={'slug': group.slug}),
+            'author': reverse(
+                'posts:profile', kwargs={'username': self.author.username}),
+            'reader': reverse(
+                'posts:profile', kwargs={'username': reader.username}),
+            'post': reverse('posts:post_detail', kwargs={'post_id': post.id}),
+        }
+
+        # Гостю форма комментария с CSRF-токеном не выводится,
+        # поэтому страницы без изменений совпадают побайтно
+        guest_client = Client()
+
+        def changed_pages(change):
+            before = {
+                name: guest_client.get(url).content
+                for name, url in urls.items()
+            }
+            change()
+            return {
+                name for name, url in urls.items()
+                if guest_client.get(url).content != before[name]
+            }
+
+        self.assertEqual(
+            changed_pages(lambda: Comment.objects.create(
+                post=post, author=reader, text='комментарий')),
+            {'post'})
+        self.assertEqual(
+            changed_pages(lambda: Follow.objects.create(
+                user=reader, author=self.author)),
+            {'author', 'reader'})
+        # Число постов автора на странице поста дорисовывается отдельно
+        self.assertEqual(
+            changed_pages(lambda: Post.objects.create(
+                text='новый пост', author=self.author, group=group)),
+            {'index', 'group', 'author', 'post'})
+
+    def test_author_rename_invalidates_pages(self):
+        """Новое имя автора сразу видно в карточках постов, а вход
+        пользователя кэш не сбрасывает."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        guest_client = Client()
+        before = guest_client.get(url).content
+        self.author.last_login = timezone.now()
+        self.author.save(update_fields=['last_login'])
+        self.assertEqual(guest_client.get(url).content, before)
+        self.author.first_name = 'Лев'
+        self.author.last_name = 'Толстой'
+        self.author.save()
+        self.assertContains(guest_client.get(url), 'Лев Толстой')
+        self.assertContains(guest_client.get(reverse('posts:index')),
+                            'Лев Толстой')
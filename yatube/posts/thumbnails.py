@@ -0,0 +1,138 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Превью, которые выводят шаблоны: имя, геометрия и параметры тега
+# {% thumbnail %}. При изменении тега в шаблонах меняйте и здесь.
+SIZES = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def generate(image):
+    """Создаём превью всех размеров: sorl сохраняет файлы и записи
+    в хранилище ключей, шаблону остаётся только их найти."""
+    for geometry, options in SIZES.values():
+        get_thumbnail(image, geometry, **options)
+
+
+def generate_for_post(post_id):
+    try:
+        post = Post.objects.only('image').filter(id=post_id).first()
+        # Пост могли удалить или убрать картинку, пока задача ждала
+        if post is not None and post.image:
+            generate(post.image)
+    except Exception:
+        logger.exception('Не удалось создать превью для поста %s', post_id)
+
+
+def _generate_in_thread(post_id):
+    try:
+        generate_for_post(post_id)
+    finally:
+        # Поток пула не закрывает соединение с базой сам
+        connection.close()
+
+
+def schedule(post):
+    """Ставим создание превью в очередь фоновых потоков, когда пост
+    сохранён в базе. С THUMBNAIL_INLINE превью создаются сразу."""
+    if not post.image:
+        return
+    post_id = post.id
+    transaction.on_commit(lambda: _submit(post_id))
+
+
+def _submit(post_id):
+    # THUMBNAIL_INLINE включают только тесты: на SQLite в памяти запись
+    # из потока пула блокирует таблицы соединению теста
+    if getattr(settings, 'THUMBNAIL_INLINE', False):
+        generate_for_post(post_id)
+    else:
+        get_executor().submit(_generate_in_thread, post_id)
+
+
+def thumbnail_name(image, geometry, options):
+    """Имя файла превью, которое sorl вычисляет в get_thumbnail.
+
+    Повторяет закрытые методы бэкенда sorl, поэтому версия sorl
+    закреплена в requirements.txt, а совпадение имён с get_thumbnail
+    проверяют тесты: обновляя sorl, запустите test_thumbnails.
+    """
+    backend = default.backend
+    source = ImageFile(image)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return backend._get_thumbnail_filename(source, geometry, options)
+
+
+def _get_raw_many(keys):
+    """Записи хранилища ключей sorl одним обращением к кэшу и одним
+    запросом к базе вместо запроса на каждый ключ."""
+    kvstore = default.kvstore
+    if not isinstance(kvstore, KVStore):
+        return {key: kvstore._get_raw(key) for key in keys}
+    values = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(KVStoreModel.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        values.update(found)
+        kvstore.cache.set_many(found, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+    return values
+
+
+def prefetch(posts):
+    """Находим готовые превью для всех постов страницы сразу.
+
+    Найденные превью кладутся в post.thumbnails по имени размера.
+    Если превью ещё нет, шаблон создаёт его тегом {% thumbnail %}.
+    """
+    posts = [post for post in posts if post.image]
+    wanted = {}
+    for post in posts:
+        post.thumbnails = {}
+        for size, (geometry, options) in SIZES.items():
+            thumbnail = ImageFile(
+                thumbnail_name(post.image, geometry, options),
+                default.storage)
+            wanted[add_prefix(thumbnail.key)] = (post, size)
+    if not wanted:
+        return
+    for key, value in _get_raw_many(list(wanted)).items():
+        # Отсутствие записи sorl тоже кэширует, это не строка
+        if isinstance(value, str):
+            post, size = wanted[key]
+            post.thumbnails[size] = deserialize_image_file(value)
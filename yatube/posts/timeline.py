@@ -0,0 +1,166 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from core.paginator import Source
+from .models import Follow, Post, PostQuerySet, Timeline, UserStats
+
+BATCH_SIZE = 500  # Размер пачки при массовой вставке записей ленты
+
+
+def is_hot(author_id):
+    """Проверяем, слишком ли много подписчиков у автора для рассылки.
+    Посты автора, ожидающего раскладки, тоже подмешиваются при чтении."""
+    return UserStats.objects.filter(
+        Q(followers_count__gt=settings.TIMELINE_FANOUT_LIMIT)
+        | Q(timeline_pending=True),
+        user_id=author_id,
+    ).exists()
+
+
+def _bulk_insert(entries):
+    for start in range(0, len(entries), BATCH_SIZE):
+        Timeline.objects.bulk_create(
+            entries[start:start + BATCH_SIZE], ignore_conflicts=True
+        )
+
+
+def push_post(post):
+    """Раскладываем новый пост по лентам всех подписчиков автора.
+
+    Посты «горячих» авторов не раскладываются: они подмешиваются
+    в ленту при чтении, чтобы не тормозить публикацию.
+    """
+    push_posts(post.author_id, [post])
+
+
+def push_posts(author_id, posts):
+    """То же для пачки новых постов одного автора."""
+    if is_hot(author_id):
+        return
+    follower_ids = list(Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True))
+    _bulk_insert([
+        Timeline(
+            user_id=user_id,
+            author_id=author_id,
+            post_id=post.id,
+            pub_date=post.pub_date
+        )
+        for post in posts
+        for user_id in follower_ids
+    ])
+
+
+def backfill(user_id, author_id):
+    """Добавляем в ленту пользователя последние посты автора."""
+    if is_hot(author_id):
+        return
+    _backfill([user_id], author_id)
+
+
+def _backfill(user_ids, author_id):
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'id', 'pub_date')[:settings.TIMELINE_BACKFILL_LIMIT]
+    _bulk_insert([
+        Timeline(
+            user_id=user_id,
+            author_id=author_id,
+            post_id=post_id,
+            pub_date=pub_date
+        )
+        for post_id, pub_date in posts
+        for user_id in user_ids
+    ])
+
+
+def remove(user_id, author_id):
+    """Убираем из ленты пользователя все посты автора."""
+    Timeline.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def cool_down(author_id):
+    """Если автор перестал быть «горячим», отмечаем, что его посты
+    нужно разложить подписчикам: пока он был «горячим», рассылка
+    не выполнялась. Раскладывает их команда fan_out_timelines пачками
+    вне запроса, а до тех пор посты подмешиваются в ленту при чтении.
+
+    Число подписчиков может упасть ниже предела не ровно на нём:
+    после пересчёта счётчиков или смены TIMELINE_FANOUT_LIMIT. Поэтому
+    «горячесть» в прошлом определяем по ленте последнего подписчика:
+    у автора, которого всегда рассылали, в ней есть его последний пост.
+    """
+    stats = UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__lte=settings.TIMELINE_FANOUT_LIMIT,
+        timeline_pending=False,
+    )
+    if not stats.exists():
+        return
+    last_post_id = Post.objects.filter(author_id=author_id).order_by(
+        '-id').values_list('id', flat=True).first()
+    last_follower_id = Follow.objects.filter(author_id=author_id).order_by(
+        '-id').values_list('user_id', flat=True).first()
+    if last_post_id is None or last_follower_id is None:
+        return
+    if not Timeline.objects.filter(
+            user_id=last_follower_id, post_id=last_post_id).exists():
+        stats.update(timeline_pending=True)
+
+
+def fan_out_pending(batch_size):
+    """Раскладываем посты отмеченных авторов по лентам подписчиков.
+
+    Подписчики обрабатываются пачками по batch_size, каждая в своей
+    транзакции. Возвращает итератор по id разложенных авторов.
+    """
+    pending = UserStats.objects.filter(timeline_pending=True)
+    for author_id in list(pending.values_list('user_id', flat=True)):
+        stats = UserStats.objects.get(user_id=author_id)
+        if stats.followers_count <= settings.TIMELINE_FANOUT_LIMIT:
+            _fan_out(author_id, batch_size)
+        else:
+            # Снова «горячий»: его посты и так подмешиваются при чтении
+            pending.filter(user_id=author_id).update(timeline_pending=False)
+        yield author_id
+
+
+def _fan_out(author_id, batch_size):
+    last_post_id = Post.objects.filter(author_id=author_id).order_by(
+        '-id').values_list('id', flat=True).first() or 0
+    follows = Follow.objects.filter(author_id=author_id).order_by('id')
+    last_follow_id = 0
+    while True:
+        batch = list(follows.filter(id__gt=last_follow_id).values_list(
+            'id', 'user_id')[:batch_size])
+        if not batch:
+            break
+        with transaction.atomic():
+            _backfill([user_id for _, user_id in batch], author_id)
+        last_follow_id = batch[-1][0]
+    with transaction.atomic():
+        UserStats.objects.filter(user_id=author_id).update(
+            timeline_pending=False)
+    # Посты, написанные во время раскладки, не попали в ленты уже
+    # обработанных подписчиков; повторы пропускает уникальный индекс
+    push_posts(author_id, Post.objects.filter(
+        author_id=author_id, id__gt=last_post_id).only('id', 'pub_date'))
+
+
+def get_feed(user):
+    """Источники ленты подписок: материализованные записи пользователя
+    и посты каждого «горячего» автора, которые сливаются при чтении."""
+    entries = Timeline.objects.filter(user_id=user.id).select_related(
+        'post__author', 'post__group'
+    ).only('pub_date', 'post_id', 'post', *(
+        f'post__{field}' for field in PostQuerySet.FEED_FIELDS
+    ))
+    hot_authors = Follow.objects.filter(
+        Q(author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT)
+        | Q(author__stats__timeline_pending=True),
+        user_id=user.id,
+    ).values_list('author_id', flat=True)
+    return [Source(entries, 'post_id', 'post')] + [
+        Source(Post.objects.feed().filter(author_id=author_id))
+        for author_id in hot_authors
+    ]
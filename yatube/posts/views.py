@@ -1,75 +1,156 @@
+from django.conf import settings
+from django.http import Http404
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from core.utils import get_paginator
-from django.views.decorators.cache import cache_page
+from django.core.paginator import Paginator
+from django.db import transaction
+from core.page_cache import cache_shared_page, fragment
+from core.ratelimit import ratelimit
+from core.paginator import decode_cursor, encode_cursor, older_than
+from core.utils import amount, get_paginator
 
 
-from .models import User, Post, Group, Follow
+from .models import User, Post, Group, Comment, Follow
 from .forms import PostForm, CommentForm
+from . import (counters, follows, recommendations, search, thumbnails,
+               timeline)
 
 
-@cache_page(20)
+@cache_shared_page('index')
 # View-функция для главной страницы:
 def index(request):
-    post_list = Post.objects.all()
+    post_list = Post.objects.feed()
+    page_obj = get_paginator(request, post_list)
+    thumbnails.prefetch(page_obj)
     context = {
-        'page_obj': get_paginator(request, post_list)
+        'page_obj': page_obj
     }
     return render(request, 'posts/index.html', context)
 
 
 # View-функция для страницы сообщества:
+@cache_shared_page('group:{slug}')
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    post_list = group.posts.feed()
+    page_obj = get_paginator(request, post_list)
+    thumbnails.prefetch(page_obj)
     context = {
         'group': group,
-        'page_obj': get_paginator(request, post_list)
+        'page_obj': page_obj
     }
     return render(request, 'posts/group_list.html', context)
 
 
 # View-функция для профайла пользователя:
+@cache_shared_page('profile:{username}')
 def profile(request, username):
-    user_profile = get_object_or_404(User, username=username)
-    post_list = user_profile.posts.all()
-    # Cчётчик для вывода общего количества постов пользователя:
-    post_count = user_profile.posts.count()
+    user_profile = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    post_list = user_profile.posts.feed()
+    # Cчётчики постов и подписок пользователя:
+    stats = counters.get_stats(user_profile)
 
+    page_obj = get_paginator(request, post_list)
+    thumbnails.prefetch(page_obj)
+    context = {
+        'user_profile': user_profile,
+        'page_obj': page_obj,
+        'post_count': stats.posts_count,
+        'stats': stats,
+    }
+    return render(request, 'posts/profile.html', context)
+
+
+# Кнопка подписки зависит от посетителя, поэтому рисуется
+# поверх кэшированной страницы профайла
+@fragment('posts/includes/follow_button.html')
+def follow_button(request, params):
     # Проверяем, подписан ли текущий пользователь на автора
     user = request.user
     following = Follow.objects.filter(
         user_id=user.id,
-        author_id=user_profile.id
+        author_id=params['author_id']
     ).exists()
+    return {'following': following}
 
-    context = {
-        'user_profile': user_profile,
-        'page_obj': get_paginator(request, post_list),
-        'post_count': post_count,
-        'following': following
-    }
-    return render(request, 'posts/profile.html', context)
+
+# Рекомендации свои у каждого посетителя
+@fragment('posts/includes/recommendations.html')
+def recommendations_sidebar(request, params):
+    return {'recommendations': recommendations.for_user(request.user)}
 
 
 # View-функция для отдельного поста:
+@cache_shared_page('post:{post_id}')
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    #  Cчётчик для вывода общего количества постов пользователя:
-    post_count = Post.objects.filter(author_id=post.author_id).count()
+    # Число постов автора дорисовывает фрагмент author_post_count
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), id=post_id)
+    thumbnails.prefetch([post])
     form = CommentForm()
-    comment = post.comments.all()
+    # Сразу выводится только первая страница комментариев,
+    # остальные подгружаются по кнопке через post_comments
+    comments, next_cursor = comments_page(post.id)
     context = {
         'post': post,
-        'post_count': post_count,
         'form': form,
-        'comments': comment
+        'comments': comments,
+        'next_cursor': next_cursor,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def comments_page(post_id, position=None):
+    """Страница комментариев поста от новых к старым, старше позиции
+    position, и курсор следующей страницы или None."""
+    size = settings.COMMENTS_PAGE_SIZE
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author').order_by('-pub_date', '-id')
+    if position is not None:
+        comments = comments.filter(older_than(position))
+    # На один комментарий больше, чтобы узнать, есть ли продолжение
+    comments = list(comments[:size + 1])
+    if len(comments) <= size:
+        return comments, None
+    comments = comments[:size]
+    last = comments[-1]
+    return comments, encode_cursor((last.pub_date, last.id))
+
+
+# Следующая страница комментариев для кнопки «Показать ещё»:
+# фрагмент HTML без обвязки страницы
+@cache_shared_page('post:{post_id}')
+def post_comments(request, post_id):
+    position = decode_cursor(request.GET.get('after', ''))
+    if position is None or not Post.objects.filter(id=post_id).exists():
+        raise Http404
+    comments, next_cursor = comments_page(post_id, position)
+    context = {
+        'post_id': post_id,
+        'comments': comments,
+        'next_cursor': next_cursor,
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+# Число постов автора меняется вместе с другими его постами,
+# а не с этим, поэтому рисуется поверх кэшированной страницы
+@fragment('posts/includes/author_post_count.html')
+def author_post_count(request, params):
+    author = User(id=params['author_id'])
+    return {'post_count': counters.get_stats(author).posts_count}
+
+
+@fragment('posts/includes/comment_form.html')
+def comment_form(request, params):
+    return {'form': CommentForm()}
+
+
 # View-функция для страницы создания постов:
 @login_required
+@ratelimit('post')
+@transaction.atomic
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -79,6 +160,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         form.save()
+        thumbnails.schedule(post)
         return redirect('posts:profile', username=request.user)
     return render(request, 'posts/post_create.html', {'form': form})
 
@@ -98,6 +180,8 @@ def post_edit(request, post_id):
 
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule(post)
         return redirect('posts:post_detail', post_id=post.id)
 
     context = {
@@ -111,6 +195,8 @@ def post_edit(request, post_id):
 
 # View-функция для комментирования постов:
 @login_required
+@ratelimit('comment')
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -125,36 +211,48 @@ def add_comment(request, post_id):
 # View-функция для страницы с подписками
 @login_required
 def follow_index(request):
-    user = request.user
-    author_list = Follow.objects.filter(
-        user_id=user.id).values_list('author_id')
-    post_list = Post.objects.filter(author_id__in=author_list)
+    post_list = timeline.get_feed(request.user)
+    page_obj = get_paginator(request, post_list)
+    thumbnails.prefetch(page_obj)
     context = {
-        'page_obj': get_paginator(request, post_list)
+        'page_obj': page_obj
     }
     return render(request, 'posts/follow.html', context)
 
 
+# View-функция для поиска по постам
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        post_list = search.search(Post.objects.feed(), query)
+        # Результаты упорядочены по релевантности, а не по дате,
+        # поэтому страницы считаются обычным смещением
+        page_obj = Paginator(post_list, amount).get_page(
+            request.GET.get('page'))
+        thumbnails.prefetch(page_obj)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 # View-функция для подписки на автора
 @login_required
+@ratelimit('follow', methods=('GET', 'POST'))
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    user = request.user
-    if author != user and not Follow.objects.filter(
-        user_id=user.id,
-        author_id=author.id
-    ).exists():
-        Follow.objects.create(
-            user_id=user.id,
-            author_id=author.id
-        )
+    follows.follow(request.user, author)
     return redirect('posts:profile', username=username)
 
 
 # View-функция для отписки
 @login_required
+@ratelimit('follow', methods=('GET', 'POST'))
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    user = request.user
-    get_object_or_404(Follow, user_id=user.id, author_id=author.id).delete()
+    follows.unfollow(request.user, author)
     return redirect('posts:profile', username=username)
@@ -155,11 +155,73 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 # CACHE
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# LocMemCache у каждого процесса свой. Когда процессов несколько,
+# CACHE_BACKEND=sqlite включает общий для них кэш в файле SQLite.
+SHARED_CACHE = os.getenv('CACHE_BACKEND') == 'sqlite'
+if SHARED_CACHE:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': os.getenv(
+                'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache.sqlite3')),
+            'OPTIONS': {
+                'MAX_ENTRIES': 100000,
+                'MAX_SIZE': 256 * 1024 * 1024,
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
     }
+# Страницы сбрасываются сигналами при изменении данных, поэтому в
+# общем кэше могут жить долго. В LocMemCache версии меняются только в
+# процессе, который сохранил данные, остальные процессы отдают старые
+# страницы до истечения срока — он должен быть коротким
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24 if SHARED_CACHE else 20
+
+# Ограничения частоты запросов: (запросов, за сколько секунд) для
+# вошедшего пользователя и для гостя по IP. Состояние хранится в кэше,
+# поэтому для нескольких процессов нужен общий кэш
+RATE_LIMITS = {
+    'api': {'user': (600, 60), 'ip': (120, 60)},
+    'post': {'user': (30, 60 * 10)},
+    'comment': {'user': (60, 60 * 10)},
+    'follow': {'user': (120, 60 * 10)},
 }
+# Заголовок, в который обратный прокси кладёт IP клиента, например
+# 'HTTP_X_FORWARDED_FOR'. None — берём REMOTE_ADDR (без прокси)
+RATELIMIT_IP_HEADER = os.getenv('RATELIMIT_IP_HEADER') or None
+
+# Ленты подписок
+# Авторы с большим числом подписчиков не раскладываются по лентам,
+# их посты подмешиваются в ленту при чтении
+TIMELINE_FANOUT_LIMIT = 1000
+# Сколько последних постов автора добавлять в ленту при подписке
+TIMELINE_BACKFILL_LIMIT = 1000
+
+# Сколько комментариев выводить на странице поста и подгружать
+# по кнопке «Показать ещё»
+COMMENTS_PAGE_SIZE = 20
+
+# Рекомендации «кого почитать»: сколько авторов хранить для каждого
+# пользователя и сколько показывать в профиле
+RECOMMENDATIONS_COUNT = 20
+RECOMMENDATIONS_SIDEBAR_COUNT = 5
+
+# Превью картинок создаются после загрузки в фоновых потоках
+THUMBNAIL_WORKERS = 2
+
+# Загруженные картинки уменьшаются и пересохраняются
+IMAGE_MAX_SIDE = 1920
+IMAGE_MAX_BYTES = 1024 * 1024
+# Больше этого числа пикселей картинки, кроме JPEG, не принимаются:
+# JPEG можно декодировать сразу в уменьшенном виде, остальные нет
+IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+# Загрузки больше этого размера пишутся во временный файл, а не в память
+FILE_UPLOAD_MAX_MEMORY_SIZE = 512 * 1024
 
 
 REST_FRAMEWORK = {
@@ -167,9 +229,19 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.TokenBucketThrottle',
     ],
 }
+# Сколько живёт пользователь в кэше аутентификации API. Изменения
+# пользователя сбрасывают кэш сразу, но только в общем кэше: с
+# LocMemCache другие процессы не узнали бы о блокировке, поэтому там
+# пользователь каждый раз читается из базы (0 — не кэшировать)
+API_USER_CACHE_TIMEOUT = 60 * 5 if SHARED_CACHE else 0
+# Сколько записей можно создать одним запросом к bulk-эндпоинтам API
+API_BULK_MAX_ITEMS = 100
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=30),